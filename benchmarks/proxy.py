@@ -0,0 +1,289 @@
+"""Load test of the Polads proxy against a local stub of the Polads API.
+
+Starts the stub, serves ``onlineadobservatory_18943.wsgi:application`` under
+waitress in a child process pointed at it, and drives the ``polads`` routes
+with concurrent clients. Prints throughput, latency percentiles and the
+server's RSS, and appends them as one JSON line to ``--output``.
+
+    python -m benchmarks.proxy --concurrency 16 --duration 20 --latency 0.05
+    python -m benchmarks.proxy --compare benchmarks/results.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import stub_polads
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = [
+    '/api/v1/total_spend/by_page/of_region/US',
+    '/api/v1/total_spend/of_page/1/of_region/US',
+    '/api/v1/spend_by_time_period/of_page/1/of_region/US',
+    '/api/v1/total_spend/by_topic/of_region/US',
+    '/api/v1/total_spend/by_purpose/of_page/1',
+    '/api/v1/targeting/of_page/1',
+    '/api/v1/getads?search=health',
+    '/api/v1/getaddetails/1',
+    '/api/v1/topics',
+    '/api/v1/races',
+    '/api/v1/search/pages_type_ahead/autocomplete/funding_entities?q=tr',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MiB, None where /proc is missing."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start_server(upstream_url, threads, extra_env=None):
+    """Serve the project under waitress in a child process, return it and its URL."""
+    port = free_port()
+    database = os.path.join(tempfile.mkdtemp(prefix='polads-bench-'), 'db.sqlite3')
+    env = dict(
+        os.environ,
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'),
+        DATABASE_URL=f'sqlite:///{database}',
+        POLADS_BASE_API_URL=upstream_url,
+        WAITRESS_THREADS=str(threads),
+        **(extra_env or {})
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'waitress', f'--listen=127.0.0.1:{port}', f'--threads={threads}',
+         'onlineadobservatory_18943.wsgi:application'],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The server exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('The server did not start listening')
+
+
+def drive(url, paths, concurrency, duration, distinct_keys=0, seed=0):
+    """Request ``paths`` from ``concurrency`` threads for ``duration`` seconds.
+
+    Returns ``(path, status, seconds)`` samples; status is None on errors.
+    With ``distinct_keys``, a random ``bench_key`` query parameter out of that
+    many values defeats the response caches.
+    """
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(number):
+        session = requests.Session()
+        rng = random.Random(seed + number)
+        position = number
+        own = []
+        while time.monotonic() < deadline:
+            path = paths[position % len(paths)]
+            position += 1
+            params = {'bench_key': rng.randrange(distinct_keys)} if distinct_keys else None
+            started = time.perf_counter()
+            try:
+                response = session.get(url + path, params=params, timeout=60)
+                status = response.status_code
+            except requests.exceptions.RequestException:
+                status = None
+            own.append((path, status, time.perf_counter() - started))
+        session.close()
+        with lock:
+            samples.extend(own)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def latency_summary(seconds):
+    ordered = sorted(seconds)
+    return {
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+    }
+
+
+def count_errors(samples):
+    return sum(1 for path, status, seconds in samples if status is None or status >= 500)
+
+
+def summarize(samples, duration):
+    summary = {
+        'requests': len(samples),
+        'errors': count_errors(samples),
+        'throughput_rps': round(len(samples) / duration, 1),
+    }
+    summary.update(latency_summary([seconds for path, status, seconds in samples]))
+    summary['routes'] = {}
+    for route in sorted({path for path, status, seconds in samples}):
+        route_samples = [sample for sample in samples if sample[0] == route]
+        summary['routes'][route] = dict(
+            requests=len(route_samples),
+            errors=count_errors(route_samples),
+            **latency_summary([seconds for path, status, seconds in route_samples])
+        )
+    return summary
+
+
+def run(options):
+    stub = stub_polads.from_arguments(options).start()
+    extra_env = None
+    if options.replay:
+        # Answer from recorded Polads traffic instead of the stub
+        extra_env = {
+            'POLADS_RECORD_MODE': 'replay',
+            'POLADS_RECORDING': os.path.abspath(options.replay),
+            'POLADS_REPLAY_LATENCY_SCALE': str(options.latency_scale),
+        }
+    process, url = start_server(stub.url, options.threads, extra_env)
+    rss = {'start': rss_mb(process.pid), 'peak': rss_mb(process.pid)}
+    sampling = threading.Event()
+
+    def sample_rss():
+        while not sampling.wait(0.5):
+            current = rss_mb(process.pid)
+            if current is not None:
+                rss['peak'] = max(rss['peak'] or 0, current)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    try:
+        if options.warmup:
+            drive(url, options.paths, options.concurrency, options.warmup, options.distinct_keys)
+        upstream_before = stub.requests
+        sampler.start()
+        samples = drive(
+            url, options.paths, options.concurrency, options.duration, options.distinct_keys, options.seed
+        )
+        rss['end'] = rss_mb(process.pid)
+    finally:
+        sampling.set()
+        process.terminate()
+        process.wait()
+        stub.shutdown()
+
+    result = {
+        'label': options.label,
+        'timestamp': datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+        'commit': git_commit(),
+        'parameters': {
+            'concurrency': options.concurrency,
+            'duration': options.duration,
+            'threads': options.threads,
+            'latency': options.latency,
+            'jitter': options.jitter,
+            'payload_bytes': options.payload_bytes,
+            'error_rate': options.error_rate,
+            'distinct_keys': options.distinct_keys,
+            'replay': options.replay,
+            'latency_scale': options.latency_scale,
+        },
+        'upstream_requests': stub.requests - upstream_before,
+        'rss_mb': {key: round(value, 1) if value is not None else None for key, value in rss.items()},
+    }
+    result.update(summarize(samples, options.duration))
+    return result
+
+
+def print_result(result, out=sys.stdout):
+    out.write(
+        f"{result['label'] or result['commit']}: {result['requests']} requests, "
+        f"{result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, "
+        f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+        f"{result['errors']} errors, {result['upstream_requests']} upstream requests, "
+        f"RSS peak {result['rss_mb']['peak']} MiB\n"
+    )
+
+
+def compare(path, out=sys.stdout):
+    """One line per saved run, oldest first."""
+    with open(path) as results:
+        for line in results:
+            if line.strip():
+                print_result(json.loads(line), out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of measured load.')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds of unmeasured load first.')
+    parser.add_argument('--threads', type=int, default=4, help='Waitress threads.')
+    parser.add_argument('--distinct-keys', dest='distinct_keys', type=int, default=0,
+                        help='Spread requests over this many cache keys per path.')
+    parser.add_argument('--path', dest='paths', action='append',
+                        help='Proxy path to request, repeatable. Defaults to a mix of polads routes.')
+    parser.add_argument('--replay', metavar='RECORDING',
+                        help='Serve upstream responses from a POLADS_RECORDING file instead of the stub.')
+    parser.add_argument('--latency-scale', dest='latency_scale', type=float, default=1.0,
+                        help='Factor applied to recorded latencies with --replay.')
+    parser.add_argument('--label', default='', help='Name of the run in the results.')
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'benchmarks', 'results.jsonl'),
+                        help='JSON lines file the result is appended to.')
+    parser.add_argument('--compare', metavar='RESULTS',
+                        help='Print the runs saved in a results file and exit.')
+    stub_polads.add_arguments(parser)
+    options = parser.parse_args(argv)
+
+    if options.compare:
+        compare(options.compare)
+        return
+    options.paths = options.paths or DEFAULT_PATHS
+    result = run(options)
+    with open(options.output, 'a') as output:
+        output.write(json.dumps(result, sort_keys=True) + '\n')
+    print_result(result)
+
+
+if __name__ == '__main__':
+    main()
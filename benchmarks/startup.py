@@ -0,0 +1,104 @@
+"""Worker startup cost of the full and API-only settings profiles.
+
+Starts a fresh interpreter per sample. Each one imports
+``onlineadobservatory_18943.wsgi``, answers one proxied request with the
+Polads client stubbed out, and reports its timings, RSS and module count.
+Medians per profile are printed and appended as JSON lines to ``--output``.
+
+    python -m benchmarks.startup --samples 5
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.proxy import BASE_DIR, git_commit
+
+PROFILES = {
+    'full': 'onlineadobservatory_18943.settings',
+    'api': 'onlineadobservatory_18943.settings_api',
+}
+
+# Runs in the child interpreter; prints one JSON document
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from onlineadobservatory_18943.wsgi import application
+imported = time.perf_counter()
+
+from unittest import mock
+from django.test import RequestFactory
+from polads.client import get_client
+upstream = mock.Mock(status_code=200, headers={}, content=b'[]')
+upstream.json.return_value = []
+with mock.patch.object(get_client(), 'get', return_value=upstream):
+    request = RequestFactory().get('/api/v1/topics', {'probe': 1}, HTTP_ACCEPT='application/json')
+    response = application(request.environ, lambda status, headers: None)
+    b''.join(response)
+first_request = time.perf_counter()
+
+rss = None
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) / 1024
+json.dump({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (first_request - imported) * 1000,
+    'rss_mb': rss,
+    'modules': len(sys.modules),
+}, sys.stdout)
+"""
+
+
+def sample(settings_module):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE=settings_module,
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'),
+        # Measures startup alone, without the refresh threads
+        POLADS_BACKGROUND_REFRESH='0',
+        DATABASE_URL='sqlite:///' + os.path.join(tempfile.gettempdir(), 'polads-bench-startup.sqlite3'),
+    )
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=BASE_DIR, env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def measure(profile, samples):
+    runs = [sample(PROFILES[profile]) for _ in range(samples)]
+    result = {'profile': profile, 'settings': PROFILES[profile], 'samples': samples}
+    for metric in ('import_ms', 'first_request_ms', 'rss_mb', 'modules'):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = round(statistics.median(values), 1) if values else None
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--samples', type=int, default=5, help='Interpreters started per profile.')
+    parser.add_argument('--profile', dest='profiles', action='append', choices=sorted(PROFILES),
+                        help='Profile to measure, repeatable. Defaults to all of them.')
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'benchmarks', 'startup.jsonl'),
+                        help='JSON lines file the results are appended to.')
+    options = parser.parse_args(argv)
+
+    timestamp = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
+    commit = git_commit()
+    with open(options.output, 'a') as output:
+        for profile in options.profiles or list(PROFILES):
+            result = measure(profile, options.samples)
+            result.update(timestamp=timestamp, commit=commit)
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            sys.stdout.write(
+                f"{profile}: import {result['import_ms']} ms, first request "
+                f"{result['first_request_ms']} ms, RSS {result['rss_mb']} MiB, "
+                f"{result['modules']} modules\n"
+            )
+
+
+if __name__ == '__main__':
+    main()
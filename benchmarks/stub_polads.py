@@ -0,0 +1,117 @@
+"""Stand-in for the Polads (ad-screener) API, for benchmarks.
+
+Answers every GET with a JSON document of about ``payload_bytes`` after
+``latency`` seconds, or with a 500 for an ``error_rate`` fraction of calls.
+
+    python -m benchmarks.stub_polads --port 8001 --latency 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def payload(path, size):
+    item = {'page_id': 1, 'page_name': 'Benchmark page', 'spend': 100}
+    item_size = len(json.dumps(item)) + 1
+    body = json.dumps({
+        'path': path,
+        'data': [dict(item, page_id=number) for number in range(max(1, size // item_size))],
+    })
+    return body.encode()
+
+
+class StubPoladsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, payload_bytes=2048, error_rate=0.0, seed=0):
+        super().__init__(address, StubPoladsHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_bytes = payload_bytes
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._bodies = {}
+
+    def body(self, path):
+        with self._lock:
+            self.requests += 1
+            if path not in self._bodies:
+                self._bodies[path] = payload(path, self.payload_bytes)
+            return self._bodies[path]
+
+    def draw(self):
+        """Latency and error outcome of the next response."""
+        with self._lock:
+            latency = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            return latency, self.random.random() < self.error_rate
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name='stub-polads', daemon=True)
+        thread.start()
+        return self
+
+
+class StubPoladsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        latency, error = self.server.draw()
+        body = self.server.body(self.path.split('?', 1)[0])
+        time.sleep(latency)
+        if error:
+            body = b'{"error": "stub failure"}'
+        self.send_response(500 if error else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Seconds before each stub response.')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Uniform +/- seconds added to the latency.')
+    parser.add_argument('--payload-bytes', type=int, default=2048,
+                        help='Approximate size of each JSON response.')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of responses that are 500 errors.')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def from_arguments(options, port=0):
+    return StubPoladsServer(
+        ('127.0.0.1', port),
+        latency=options.latency,
+        jitter=options.jitter,
+        payload_bytes=options.payload_bytes,
+        error_rate=options.error_rate,
+        seed=options.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8001)
+    add_arguments(parser)
+    options = parser.parse_args()
+    server = from_arguments(options, port=options.port)
+    print(f'Stub Polads API on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ from rest_framework.viewsets import ModelViewSet, ViewSet
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
+from django.conf import settings
 from django.core.mail import send_mail
 
 from home.api.v1.serializers import (
@@ -70,4 +71,7 @@ class SendEmail(APIView):
             )
         except Exception as E:
             return Response(str(E))
+        if settings.EMAIL_QUEUE:
+            # Sent by the send_queued_email worker
+            return Response("Email queued for sending.")
         return Response("Email sent successfully.")
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class HomeConfig(AppConfig):
     name = 'home'
+
+    def ready(self):
+        from home.email import outbox_metrics
+        from home.models import CustomText, HomePage
+        from home.views import invalidate_home_page
+        from polads.metrics import metrics
+
+        metrics.register(outbox_metrics)
+        for model in (CustomText, HomePage):
+            for signal in (post_save, post_delete):
+                signal.connect(invalidate_home_page, sender=model, dispatch_uid=f'home_page_{model.__name__}')
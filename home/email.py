@@ -0,0 +1,172 @@
+"""
+Durable outbox for outgoing email.
+
+QueuedEmailBackend only stores messages in OutboundEmail, so sending mail
+from a request costs one insert. The send_queued_email command sends them
+in batches over a single connection of EMAIL_OUTBOX_BACKEND and retries
+failures with exponential backoff.
+"""
+import base64
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from home.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def serialize(message):
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError("MIME attachments cannot be queued, attach file contents instead")
+        filename, content, mimetype = attachment
+        if isinstance(content, bytes):
+            attachments.append([filename, base64.b64encode(content).decode(), mimetype, True])
+        else:
+            attachments.append([filename, content, mimetype, False])
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'content_subtype': message.content_subtype,
+        'attachments': attachments,
+    })
+
+
+def deserialize(data):
+    data = json.loads(data)
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        alternatives=[tuple(alternative) for alternative in data['alternatives']],
+    )
+    message.content_subtype = data['content_subtype']
+    for filename, content, mimetype, is_bytes in data['attachments']:
+        message.attach(filename, base64.b64decode(content) if is_bytes else content, mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Email backend that adds messages to the outbox instead of sending them."""
+
+    def send_messages(self, email_messages):
+        rows = [
+            OutboundEmail(message=serialize(message))
+            for message in email_messages if message.recipients()
+        ]
+        OutboundEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+def _retry(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.failed = email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    email.next_attempt_at = timezone.now() + timedelta(
+        seconds=min(settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1),
+                    settings.EMAIL_OUTBOX_MAX_RETRY_DELAY)
+    )
+
+
+def _claim(batch_size):
+    """Lease a batch of due emails so that other workers skip them meanwhile.
+
+    Rows are only locked while leasing; an email whose worker died before
+    recording the outcome is due again once EMAIL_OUTBOX_LEASE has passed.
+    """
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(sent_at__isnull=True, failed=False, next_attempt_at__lte=timezone.now())
+            .order_by('created_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        )
+    return emails
+
+
+def send_queued(batch_size):
+    """Send one batch of due outbox emails over one connection, oldest first.
+
+    Each email is marked sent as soon as the server accepted it, so a crash
+    later in the batch never sends it again. Returns ``(sent, failed)`` counts.
+    """
+    emails = _claim(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(settings.EMAIL_OUTBOX_BACKEND, fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Opening the email connection failed: %s", e)
+        for email in emails:
+            _retry(email, e)
+            email.save(update_fields=['attempts', 'last_error', 'failed', 'next_attempt_at'])
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            started = time.perf_counter()
+            try:
+                message = deserialize(email.message)
+                message.connection = connection
+                message.send()
+            except Exception as e:
+                _retry(email, e)
+                email.save(update_fields=['attempts', 'last_error', 'failed', 'next_attempt_at'])
+                failed += 1
+            else:
+                email.sent_at = timezone.now()
+                email.send_seconds = time.perf_counter() - started
+                email.save(update_fields=['sent_at', 'send_seconds'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def outbox_metrics():
+    """Queue depth and recent send latency of the outbox, for /api/v1/polads/metrics."""
+    now = timezone.now()
+    pending = OutboundEmail.objects.filter(sent_at__isnull=True, failed=False)
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    recent = sorted(
+        OutboundEmail.objects.filter(
+            sent_at__gte=now - timedelta(seconds=settings.EMAIL_OUTBOX_METRICS_WINDOW)
+        ).values_list('send_seconds', flat=True)[:10000]
+    )
+    yield ('email_outbox_pending', 'Emails waiting to be sent.', {}, pending.count())
+    yield ('email_outbox_failed', 'Emails given up on after EMAIL_OUTBOX_MAX_ATTEMPTS.', {},
+           OutboundEmail.objects.filter(failed=True).count())
+    yield ('email_outbox_oldest_pending_seconds', 'Age of the oldest email waiting to be sent.', {},
+           (now - oldest).total_seconds() if oldest else 0)
+    for quantile in (0.5, 0.95, 0.99):
+        yield ('email_outbox_send_seconds',
+               'SMTP time per email sent within EMAIL_OUTBOX_METRICS_WINDOW, by quantile.',
+               {'quantile': quantile},
+               recent[min(len(recent) - 1, int(quantile * len(recent)))] if recent else 0)
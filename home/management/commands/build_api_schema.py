@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from onlineadobservatory_18943.schema import code_version, schema_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema served by /api-docs/ for this code version.'
+
+    def handle(self, *args, **options):
+        version = code_version()
+        for path in schema_artifacts.build(version):
+            self.stdout.write(f"Wrote {path}")
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home.email import send_queued
+
+
+class Command(BaseCommand):
+    help = 'Send the emails waiting in the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Number of emails sent over one connection.',
+        )
+        parser.add_argument(
+            '--every', dest='every', type=int, default=None,
+            help='Keep running and send queued emails every N seconds.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before sleeping
+            while True:
+                sent, failed = send_queued(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+                if sent + failed < options['batch_size']:
+                    break
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -3,6 +3,7 @@ from django.db import models
 # Create your models here.
 
 from django.db import models
+from django.utils import timezone
 
 
 class CustomText(models.Model):
@@ -30,3 +31,24 @@ class HomePage(models.Model):
     @property
     def field(self):
         return 'body'
+
+
+class OutboundEmail(models.Model):
+    """Email waiting in the outbox for the send_queued_email command.
+
+    ``message`` is the JSON form of the EmailMessage, see home/email.py.
+    """
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True)
+    # Seconds the SMTP server took to accept the message
+    send_seconds = models.FloatField(null=True)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'failed', 'next_attempt_at']),
+        ]
@@ -0,0 +1,83 @@
+from unittest import mock
+
+import pytest
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from home.email import deserialize, send_queued, serialize
+from home.models import OutboundEmail
+from polads.metrics import metrics
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def queued_email(settings):
+    settings.EMAIL_QUEUE = True
+    settings.EMAIL_BACKEND = 'home.email.QueuedEmailBackend'
+    settings.EMAIL_OUTBOX_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+def test_message_round_trip():
+    message = EmailMultiAlternatives('Hi', 'Plain', 'a@example.com', ['b@example.com'], bcc=['c@example.com'])
+    message.attach_alternative('<b>Rich</b>', 'text/html')
+    message.attach('data.bin', b'\x00\x01', 'application/octet-stream')
+
+    copy = deserialize(serialize(message))
+    assert copy.recipients() == ['b@example.com', 'c@example.com']
+    assert copy.alternatives == [('<b>Rich</b>', 'text/html')]
+    assert copy.attachments == [('data.bin', b'\x00\x01', 'application/octet-stream')]
+
+
+def test_send_mail_endpoint_queues():
+    response = APIClient().post('/api/v1/send_mail/', {
+        'from_email': 'a@example.com', 'to_email': 'b@example.com', 'subject': 'Hi', 'body': 'Hello',
+    })
+    assert response.json() == 'Email queued for sending.'
+    assert mail.outbox == []
+    assert OutboundEmail.objects.count() == 1
+
+    call_command('send_queued_email')
+    assert [message.subject for message in mail.outbox] == ['Hi']
+    assert OutboundEmail.objects.get().sent_at is not None
+
+
+def test_failed_batch_is_retried_later():
+    send_mail('Hi', 'Hello', 'a@example.com', ['b@example.com'])
+    with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                    side_effect=ConnectionError('refused')):
+        assert send_queued(10) == (0, 1)
+
+    email = OutboundEmail.objects.get()
+    assert email.attempts == 1 and email.last_error == 'refused' and not email.failed
+    # Not due until the retry delay has passed
+    assert send_queued(10) == (0, 0)
+
+    OutboundEmail.objects.update(next_attempt_at=email.created_at)
+    assert send_queued(10) == (1, 0)
+    assert len(mail.outbox) == 1
+
+
+def test_outbox_gauges_are_rendered():
+    send_mail('Hi', 'Hello', 'a@example.com', ['b@example.com'])
+    text = metrics.render()
+    assert '# TYPE email_outbox_pending gauge' in text
+    assert 'email_outbox_pending 1' in text
+    assert 'email_outbox_send_seconds{quantile="0.95"} 0' in text
+
+
+def test_sent_emails_are_committed_one_by_one():
+    send_mail('First', 'Hello', 'a@example.com', ['b@example.com'])
+    send_mail('Second', 'Hello', 'a@example.com', ['b@example.com'])
+
+    with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                    side_effect=[1, KeyboardInterrupt]):
+        with pytest.raises(KeyboardInterrupt):
+            send_queued(10)
+
+    first, second = OutboundEmail.objects.order_by('created_at')
+    assert first.sent_at is not None
+    # Leased, so no other worker sends it before the lease expires
+    assert second.sent_at is None and second.next_attempt_at > second.created_at
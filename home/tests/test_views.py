@@ -0,0 +1,58 @@
+import gzip
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+
+from home.models import CustomText, HomePage
+from users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def home_page(settings):
+    # No collectstatic manifest in tests
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    cache.clear()
+    CustomText.objects.all().delete()
+    HomePage.objects.all().delete()
+    CustomText.objects.create(title='Observatory')
+    yield HomePage.objects.create(body='<p>Welcome</p>')
+    cache.clear()
+
+
+def test_anonymous_page_is_cached(django_assert_num_queries):
+    first = Client().get('/')
+    with django_assert_num_queries(0):
+        second = Client().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+    assert b'Welcome' in first.content
+    assert second['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(second.content) == first.content
+    assert second['ETag'] == first['ETag'][:-1] + '-gzip"'
+    assert Client().get('/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    assert Client().get('/', HTTP_IF_NONE_MATCH=second['ETag']).status_code == 200
+    assert Client().get(
+        '/', HTTP_IF_NONE_MATCH=second['ETag'], HTTP_ACCEPT_ENCODING='gzip'
+    ).status_code == 304
+
+
+def test_edit_invalidates_page(home_page):
+    etag = Client().get('/')['ETag']
+    home_page.body = '<p>Edited</p>'
+    home_page.save()
+
+    response = Client().get('/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert b'Edited' in response.content
+
+
+def test_signed_in_users_are_not_served_the_cache():
+    Client().get('/')
+    client = Client()
+    client.force_login(UserFactory())
+
+    response = client.get('/')
+    assert b'Logout' in response.content
+    assert not response.has_header('ETag')
@@ -1,11 +1,39 @@
+import hashlib
+from collections import namedtuple
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.text import compress_string
 
 # Create your views here.
 
 from home.models import CustomText, HomePage
 
+# Rendered anonymous home page, stored under the current generation so that
+# a render racing with an edit can never be served after the edit
+GENERATION_KEY = 'home:generation'
+PAGE_KEY = 'home:page:{}'
 
-def home(request):
+CachedPage = namedtuple('CachedPage', ['content', 'gzipped', 'etag', 'content_type'])
+
+
+def invalidate_home_page(**kwargs):
+    """Receiver of CustomText and HomePage changes, connected in HomeConfig.ready."""
+    cache.set(GENERATION_KEY, uuid4().hex, None)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _render(request):
     packages = [
 	{'name':'django-allauth', 'url': 'https://pypi.org/project/django-allauth/0.38.0/'},
 	{'name':'django-bootstrap4', 'url': 'https://pypi.org/project/django-bootstrap4/0.0.7/'},
@@ -17,3 +45,35 @@ def home(request):
         'packages': packages
     }
     return render(request, 'home/index.html', context)
+
+
+def home(request):
+    """Home page; anonymous visitors get a cached copy, gzipped when accepted."""
+    if request.user.is_authenticated:
+        return _render(request)
+
+    key = PAGE_KEY.format(_generation())
+    page = cache.get(key)
+    if page is None:
+        response = _render(request)
+        page = CachedPage(
+            response.content,
+            compress_string(response.content),
+            '"%s"' % hashlib.sha1(response.content).hexdigest()[:20],
+            response['Content-Type'],
+        )
+        cache.set(key, page, None)
+
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(page.gzipped, content_type=page.content_type)
+        response['Content-Encoding'] = 'gzip'
+        # A strong ETag identifies exact bytes, so each encoding has its own
+        etag = page.etag[:-1] + '-gzip"'
+    else:
+        response = HttpResponse(page.content, content_type=page.content_type)
+        etag = page.etag
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    # Signed-in visitors get another page
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,238 @@
+"""
+Prebuilt OpenAPI schema of the project.
+
+The schema is generated once per code version, without a request so that it
+does not depend on the host, and kept in memory and in API_SCHEMA_DIR as
+JSON and YAML, each also gzip-compressed. The build_api_schema command
+writes it at build time; otherwise the first docs request does.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import namedtuple
+
+import django
+import drf_yasg
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.urls.converters import IntConverter, SlugConverter, UUIDConverter
+from django.urls.resolvers import RoutePattern
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import _SpecRenderer
+from drf_yasg.views import get_schema_view
+
+API_INFO = openapi.Info(
+    title="OnlineAdObservatory API",
+    default_version="v1",
+    description="API documentation for OnlineAdObservatory App",
+)
+
+# Descriptions of URL parameters that have no model field to take them from
+PATH_PARAMETER_DESCRIPTIONS = {
+    'page_id': 'Facebook page id.',
+    'region_name': 'Region name as used by Polads, e.g. US or a state.',
+    'topic_name': 'Topic name as listed by /api/v1/topics.',
+    'ad_cluster_id': 'Id of a cluster of identical ads.',
+    'archive_id': 'Facebook Ad Library archive id.',
+    'race_id': 'Race id as listed by /api/v1/races.',
+    'email': 'Email of the subscriber.',
+    'notification_id': 'Notification id as listed by notifications/of_user.',
+}
+
+CODECS = {
+    'json': OpenAPICodecJson,
+    'yaml': OpenAPICodecYaml,
+}
+
+SchemaArtifact = namedtuple('SchemaArtifact', ['content', 'gzipped', 'etag'])
+
+_ROUTE_PARAMETER = re.compile(r'<(?:[^>:]+:)?(\w+)>')
+
+
+def path_converters(resolver=None, prefix='/', converters=None):
+    """URL converters of each route pattern, keyed by templated path.
+
+    Paths are written the way the schema generator writes them, e.g.
+    ``/api/v1/race/{race_id}/candidates``. Regex patterns are skipped.
+    """
+    resolver = resolver or get_resolver()
+    found = {}
+    for pattern in resolver.url_patterns:
+        if not isinstance(pattern.pattern, RoutePattern):
+            continue
+        path = prefix + _ROUTE_PARAMETER.sub(r'{\1}', str(pattern.pattern))
+        pattern_converters = dict(converters or {}, **pattern.pattern.converters)
+        if isinstance(pattern, URLResolver):
+            found.update(path_converters(pattern, path, pattern_converters))
+        elif isinstance(pattern, URLPattern):
+            found[path] = pattern_converters
+    return found
+
+
+class SchemaGenerator(OpenAPISchemaGenerator):
+    """Types URL parameters after their path converters, e.g. ``<int:page_id>``."""
+
+    def get_schema(self, request=None, public=False):
+        self._path_converters = path_converters()
+        return super().get_schema(request, public)
+
+    def get_path_parameters(self, path, view_cls):
+        parameters = super().get_path_parameters(path, view_cls)
+        converters = getattr(self, '_path_converters', {}).get(path, {})
+        for parameter in parameters:
+            converter = converters.get(parameter.name)
+            if isinstance(converter, IntConverter):
+                parameter.type = openapi.TYPE_INTEGER
+                parameter.pop('pattern', None)
+            elif isinstance(converter, SlugConverter):
+                parameter.pattern = f'^{converter.regex}$'
+            elif isinstance(converter, UUIDConverter):
+                parameter.format = openapi.FORMAT_UUID
+            if not parameter.get('description') and parameter.name in PATH_PARAMETER_DESCRIPTIONS:
+                parameter.description = PATH_PARAMETER_DESCRIPTIONS[parameter.name]
+        return parameters
+
+
+def source_directories():
+    """Package directories of the project and of its apps under BASE_DIR.
+
+    Third-party apps are covered by their versions, and anything else under
+    BASE_DIR, such as a virtualenv or node_modules, is left out.
+    """
+    base_dir = os.path.realpath(settings.BASE_DIR)
+    directories = {os.path.dirname(os.path.realpath(__file__))}
+    for app_config in apps.get_app_configs():
+        path = os.path.realpath(app_config.path)
+        if path.startswith(base_dir + os.sep):
+            directories.add(path)
+    return sorted(directories)
+
+
+def code_version():
+    """Digest of the project sources and schema libraries.
+
+    Only what is in the image goes in, so the version computed when the
+    image is built is the one looked up at run time.
+    """
+    digest = hashlib.sha1(f'{django.__version__} {drf_yasg.__version__}'.encode())
+    for directory in source_directories():
+        for root, directories, files in os.walk(directory):
+            directories[:] = sorted(
+                name for name in directories if not name.startswith('.') and name != '__pycache__'
+            )
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                    with open(path, 'rb') as source:
+                        digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def compress(content):
+    # A fixed mtime keeps the artifact identical across builds
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as gzip_file:
+        gzip_file.write(content)
+    return buffer.getvalue()
+
+
+class SchemaArtifacts:
+    """Encoded schema of each codec, loaded from ``directory`` or generated once."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._artifacts = {}
+        self._schema = None
+        self._lock = threading.Lock()
+
+    def _path(self, version, codec):
+        return os.path.join(self.directory, f'{version}.{codec}')
+
+    def encode(self, codec):
+        """Schema encoded with a codec, generated on the first call only."""
+        if self._schema is None:
+            self._schema = SchemaGenerator(API_INFO).get_schema(request=None, public=True)
+        content = CODECS[codec]([]).encode(self._schema)
+        return content, compress(content)
+
+    def write(self, version, codec, content, gzipped):
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for path, data in ((self._path(version, codec), content),
+                           (self._path(version, codec) + '.gz', gzipped)):
+            with open(path + '.tmp', 'wb') as artifact:
+                artifact.write(data)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        return paths
+
+    def build(self, version=None):
+        """Write the schema of every codec to ``directory``, returns the paths."""
+        version = version or code_version()
+        paths = []
+        for codec in CODECS:
+            paths.extend(self.write(version, codec, *self.encode(codec)))
+        return paths
+
+    def _load(self, version, codec):
+        with open(self._path(version, codec), 'rb') as artifact:
+            content = artifact.read()
+        with open(self._path(version, codec) + '.gz', 'rb') as artifact:
+            return content, artifact.read()
+
+    def get(self, codec):
+        artifact = self._artifacts.get(codec)
+        if artifact is not None:
+            return artifact
+        with self._lock:
+            if codec not in self._artifacts:
+                version = code_version()
+                try:
+                    content, gzipped = self._load(version, codec)
+                except OSError:
+                    content, gzipped = self.encode(codec)
+                    try:
+                        self.write(version, codec, content, gzipped)
+                    except OSError:
+                        # Read-only deployments keep it in memory only
+                        pass
+                etag = '"%s"' % hashlib.sha1(content).hexdigest()[:20]
+                self._artifacts[codec] = SchemaArtifact(content, gzipped, etag)
+            return self._artifacts[codec]
+
+
+schema_artifacts = SchemaArtifacts(settings.API_SCHEMA_DIR)
+
+schema_view = get_schema_view(API_INFO, public=True, generator_class=SchemaGenerator)
+
+
+class PrebuiltSchemaView(schema_view):
+    """Schema view that serves the prebuilt artifacts instead of generating."""
+
+    def get(self, request, version='', format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, _SpecRenderer):
+            # The UI page is rendered without paths and loads the schema itself
+            return super().get(request, version, format)
+
+        artifact = schema_artifacts.get('yaml' if renderer.codec_class is OpenAPICodecYaml else 'json')
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(artifact.gzipped)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(artifact.content)
+        response['Content-Type'] = f'{renderer.media_type}; charset=utf-8'
+        response['ETag'] = artifact.etag
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return get_conditional_response(request, etag=artifact.etag, response=response)
@@ -47,8 +47,9 @@ INSTALLED_APPS = [
     'django.contrib.sites'
 ]
 LOCAL_APPS = [
-    'home',
+    'home.apps.HomeConfig',
     'users.apps.UsersConfig',
+    'polads.apps.PoladsConfig',
 ]
 THIRD_PARTY_APPS = [
     'rest_framework',
@@ -67,6 +68,7 @@ THIRD_PARTY_APPS = [
 INSTALLED_APPS += LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    'polads.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -144,7 +146,7 @@ USE_TZ = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 25
@@ -168,6 +170,10 @@ STATICFILES_DIRS = [
 ]
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Prebuilt OpenAPI schema, see onlineadobservatory_18943/schema.py, keyed to
+# a digest of the source files.
+API_SCHEMA_DIR = env.str("API_SCHEMA_DIR", default=os.path.join(BASE_DIR, "api-schema"))
+
 # allauth / users
 ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_AUTHENTICATION_METHOD = 'email'
@@ -195,18 +201,195 @@ REST_AUTH_REGISTER_SERIALIZERS = {
 # Custom user model
 AUTH_USER_MODEL = "users.User"
 
+# Authenticated API tokens are cached in process for AUTH_TOKEN_LOCAL_TTL
+# seconds, and in the shared Polads cache tier (POLADS_CACHE_URL) for
+# AUTH_TOKEN_SHARED_TTL. Deleting a token or saving its user invalidates both
+# tiers; other workers' in-process copies expire within AUTH_TOKEN_LOCAL_TTL.
+AUTH_TOKEN_CACHE_MAX_ENTRIES = env.int("AUTH_TOKEN_CACHE_MAX_ENTRIES", 10000)
+AUTH_TOKEN_LOCAL_TTL = env.int("AUTH_TOKEN_LOCAL_TTL", 30)
+AUTH_TOKEN_SHARED_TTL = env.int("AUTH_TOKEN_SHARED_TTL", 5 * 60)
+
 EMAIL_HOST = env.str("EMAIL_HOST", "smtp.sendgrid.net")
 EMAIL_HOST_USER = env.str("SENDGRID_USERNAME", "")
 EMAIL_HOST_PASSWORD = env.str("SENDGRID_PASSWORD", "")
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 
+# With EMAIL_QUEUE, outgoing email is stored in the home.OutboundEmail outbox
+# and sent by the send_queued_email worker through EMAIL_OUTBOX_BACKEND, in
+# batches over one connection; mail is only delivered while that worker
+# runs. Failures are retried EMAIL_OUTBOX_MAX_ATTEMPTS times, waiting
+# EMAIL_OUTBOX_RETRY_DELAY seconds at first and doubling after every attempt.
+EMAIL_QUEUE = env.bool("EMAIL_QUEUE", False)
+EMAIL_OUTBOX_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+if EMAIL_QUEUE:
+    EMAIL_BACKEND = "home.email.QueuedEmailBackend"
+EMAIL_OUTBOX_BATCH_SIZE = env.int("EMAIL_OUTBOX_BATCH_SIZE", 100)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int("EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+EMAIL_OUTBOX_RETRY_DELAY = env.int("EMAIL_OUTBOX_RETRY_DELAY", 60)
+EMAIL_OUTBOX_MAX_RETRY_DELAY = env.int("EMAIL_OUTBOX_MAX_RETRY_DELAY", 60 * 60)
+# Seconds a claimed email is hidden from other workers while it is being sent
+EMAIL_OUTBOX_LEASE = env.int("EMAIL_OUTBOX_LEASE", 5 * 60)
+# Send latency quantiles of the metrics endpoint cover this many seconds
+EMAIL_OUTBOX_METRICS_WINDOW = env.int("EMAIL_OUTBOX_METRICS_WINDOW", 15 * 60)
+
 
 POLADS_API_TOKEN = env.str("POLADS_API_TOKEN", "")
-POLADS_BASE_API_URL = 'https://dev.ad-screener.ad-observatory.com'
+POLADS_BASE_API_URL = env.str("POLADS_BASE_API_URL", default='https://dev.ad-screener.ad-observatory.com')
+
+# Polads upstream client: one keep-alive pool per worker process, sized to
+# match the number of threads that can call it concurrently: waitress
+# threads plus the fan-out threads of /api/v1/batch and composed endpoints.
+WAITRESS_THREADS = env.int("WAITRESS_THREADS", 4)
+POLADS_FANOUT_WORKERS = env.int("POLADS_FANOUT_WORKERS", 8)
+POLADS_POOL_CONNECTIONS = env.int("POLADS_POOL_CONNECTIONS", 1)
+POLADS_POOL_MAXSIZE = env.int("POLADS_POOL_MAXSIZE", WAITRESS_THREADS + POLADS_FANOUT_WORKERS)
+POLADS_POOL_BLOCK = env.bool("POLADS_POOL_BLOCK", False)
+# Admission control of upstream requests made for API users. At most
+# MAX_IN_FLIGHT run at once; the rest queue per organisation and share freed
+# slots in proportion to their weight (1 unless listed, e.g.
+# POLADS_BULKHEAD_WEIGHTS=acme=2,press=1). An organisation with MAX_QUEUE
+# waiting requests, or a request queued for QUEUE_TIMEOUT seconds, gets a 503.
+POLADS_BULKHEAD_MAX_IN_FLIGHT = env.int("POLADS_BULKHEAD_MAX_IN_FLIGHT", POLADS_POOL_MAXSIZE)
+POLADS_BULKHEAD_MAX_QUEUE = env.int("POLADS_BULKHEAD_MAX_QUEUE", WAITRESS_THREADS)
+POLADS_BULKHEAD_QUEUE_TIMEOUT = env.float("POLADS_BULKHEAD_QUEUE_TIMEOUT", 5)
+POLADS_BULKHEAD_RETRY_AFTER = env.int("POLADS_BULKHEAD_RETRY_AFTER", 2)
+POLADS_BULKHEAD_WEIGHTS = env.dict("POLADS_BULKHEAD_WEIGHTS", cast={"value": float}, default={})
+POLADS_CONNECT_TIMEOUT = env.float("POLADS_CONNECT_TIMEOUT", 3.05)
+POLADS_READ_TIMEOUT = env.float("POLADS_READ_TIMEOUT", 15)
+# (connect, read) timeouts keyed by route template of polads/api/v1/urls.py
+POLADS_ROUTE_TIMEOUTS = {
+    'getads': (POLADS_CONNECT_TIMEOUT, 30),
+    'getaddetails/<int:ad_cluster_id>': (POLADS_CONNECT_TIMEOUT, 30),
+    'search/pages_type_ahead/autocomplete/funding_entities': (POLADS_CONNECT_TIMEOUT, 5),
+}
+# Record upstream responses to the POLADS_RECORDING SQLite file ("record"),
+# or answer from it without network access ("replay"), sleeping for the
+# recorded latency times POLADS_REPLAY_LATENCY_SCALE (0 for no delay).
+POLADS_RECORD_MODE = env.str("POLADS_RECORD_MODE", default="")
+POLADS_RECORDING = env.str("POLADS_RECORDING", default=os.path.join(BASE_DIR, "polads-recording.sqlite3"))
+POLADS_REPLAY_LATENCY_SCALE = env.float("POLADS_REPLAY_LATENCY_SCALE", 1.0)
+
+# The default cache also holds the anonymous home page, invalidated when
+# CustomText or HomePage is saved. Use a cache shared by all processes when
+# running several, so an edit made through one is seen by all.
+CACHES = {
+    'default': env.cache("CACHE_URL", default="locmemcache://"),
+}
+if env.str("POLADS_CACHE_URL", default=None):
+    # Cache tier shared by all workers and management commands, e.g.
+    # filecache:///var/tmp/polads or memcache://127.0.0.1:11211
+    CACHES['polads'] = env.cache("POLADS_CACHE_URL")
+
+# Hit counts of cacheable routes used by the warm_polads_cache command
+POLADS_HOT_KEYS_FLUSH_INTERVAL = env.int("POLADS_HOT_KEYS_FLUSH_INTERVAL", 60)
+POLADS_HOT_KEYS_MAX = env.int("POLADS_HOT_KEYS_MAX", 1000)
+# Paths always warmed by warm_polads_cache, in addition to the hottest keys
+POLADS_WARM_PATHS = [
+    '/topics',
+    '/races',
+]
+
+# In-process response cache of read-only Polads routes. TTLs (seconds) are
+# keyed by route template; routes not listed use POLADS_CACHE_DEFAULT_TTL,
+# and None disables caching. notifications/* routes are never cached.
+# Entries are kept decoded; POLADS_CACHE_MAX_BYTES bounds the sum of their
+# upstream JSON body lengths, and the decoded objects take several times that
+# much memory.
+POLADS_CACHE_MAX_ENTRIES = env.int("POLADS_CACHE_MAX_ENTRIES", 2048)
+POLADS_CACHE_MAX_BYTES = env.int("POLADS_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+POLADS_CACHE_DEFAULT_TTL = None
+POLADS_CACHE_TTLS = {
+    'topics': 6 * 60 * 60,
+    'races': 6 * 60 * 60,
+    'race/<int:race_id>/candidates': 6 * 60 * 60,
+    'total_spend/by_page/of_region/<slug:region_name>': 15 * 60,
+    'total_spend/of_page/<int:page_id>/of_region/<slug:region_name>': 15 * 60,
+    'total_spend/by_page/of_topic/<slug:topic_name>/of_region/<slug:region_name>': 15 * 60,
+    'total_spend/by_topic/of_region/<slug:region_name>': 15 * 60,
+    'total_spend/by_purpose/of_page/<int:page_id>': 15 * 60,
+    'total_spend/by_purpose/of_region/<slug:region_name>': 15 * 60,
+    'total_spend/by_targeting/of_region/<slug:region_name>': 15 * 60,
+    'total_spend/by_targeting/of_page/<int:page_id>': 15 * 60,
+    'spend_by_time_period/of_page/<int:page_id>/of_region/<slug:region_name>': 15 * 60,
+    'spend_by_time_period/by_topic/of_page/<int:page_id>': 15 * 60,
+    'spend_by_time_period/of_topic/<slug:topic_name>/of_region/<slug:region_name>': 15 * 60,
+    'targeting/of_page/<int:page_id>': 15 * 60,
+    'search/pages_type_ahead/autocomplete/funding_entities': 5 * 60,
+    'page_summary/of_page/<int:page_id>/of_region/<slug:region_name>': 15 * 60,
+}
+
+# Routes whose upstream body is streamed to the client in chunks instead of
+# being decoded to Python objects and re-rendered. They bypass the cache.
+POLADS_PASSTHROUGH_ROUTES = [
+    'getads',
+]
+POLADS_STREAM_CHUNK_SIZE = env.int("POLADS_STREAM_CHUNK_SIZE", 64 * 1024)
+
+# Routes whose responses never change once an ad is archived. Their raw
+# bodies are kept without TTL in an LRU cache bounded in bytes.
+POLADS_IMMUTABLE_ROUTES = [
+    'getaddetails/<int:ad_cluster_id>',
+    'archive-id/<int:archive_id>/cluster',
+]
+POLADS_IMMUTABLE_CACHE_MAX_BYTES = env.int("POLADS_IMMUTABLE_CACHE_MAX_BYTES", 128 * 1024 * 1024)
+POLADS_IMMUTABLE_CACHE_MAX_ENTRY_BYTES = env.int("POLADS_IMMUTABLE_CACHE_MAX_ENTRY_BYTES", 1024 * 1024)
+POLADS_BULK_ARCHIVE_IDS_MAX = env.int("POLADS_BULK_ARCHIVE_IDS_MAX", 500)
+
+POLADS_BATCH_MAX_REQUESTS = env.int("POLADS_BATCH_MAX_REQUESTS", 20)
+POLADS_PAGE_SUMMARY_TIMEOUT = env.float("POLADS_PAGE_SUMMARY_TIMEOUT", 10)
+
+# Local replica of spend data filled by the sync_polads command. When
+# enabled, spend routes are answered from it and proxied only on a miss.
+POLADS_LOCAL_SPEND = env.bool("POLADS_LOCAL_SPEND", False)
+POLADS_REPLICA_REGIONS = env.list("POLADS_REPLICA_REGIONS", default=["US"])
+POLADS_REPLICA_MAX_PAGES = env.int("POLADS_REPLICA_MAX_PAGES", 500)
+
+# Worker-start loading and periodic refresh of in-memory indexes of the
+# polads app, started by wsgi.py in web workers only, never by management
+# commands. Off by default so tests and local runs stay offline.
+POLADS_BACKGROUND_REFRESH = env.bool("POLADS_BACKGROUND_REFRESH", False)
+# Funding entity / page name prefix index answering the autocomplete route.
+# It only holds the pages of the spend replica (POLADS_REPLICA_MAX_PAGES).
+POLADS_AUTOCOMPLETE_REFRESH_INTERVAL = env.int("POLADS_AUTOCOMPLETE_REFRESH_INTERVAL", 15 * 60)
+POLADS_AUTOCOMPLETE_LIMIT = env.int("POLADS_AUTOCOMPLETE_LIMIT", 10)
+# Topics, races and race candidates served from memory; each refresh is
+# spread randomly over +/- the jitter fraction of the interval
+POLADS_REFERENCE_REFRESH_INTERVAL = env.int("POLADS_REFERENCE_REFRESH_INTERVAL", 30 * 60)
+POLADS_REFERENCE_REFRESH_JITTER = env.float("POLADS_REFERENCE_REFRESH_JITTER", 0.1)
+
+# SQLite FTS5 file of ad creatives filled by the index_polads_ads command.
+# When set and non-empty, getads searches are answered from it.
+POLADS_AD_SEARCH_INDEX = env.str("POLADS_AD_SEARCH_INDEX", default="")
+POLADS_AD_SEARCH_MAX_LIMIT = env.int("POLADS_AD_SEARCH_MAX_LIMIT", 100)
+
+# Notification subscriptions kept in the polads app's database. When enabled,
+# the notifications routes are answered locally and changes are written to
+# Polads by the process_notification_outbox command, with retries.
+POLADS_LOCAL_NOTIFICATIONS = env.bool("POLADS_LOCAL_NOTIFICATIONS", False)
+POLADS_OUTBOX_BATCH_SIZE = env.int("POLADS_OUTBOX_BATCH_SIZE", 50)
+POLADS_OUTBOX_MAX_ATTEMPTS = env.int("POLADS_OUTBOX_MAX_ATTEMPTS", 8)
+# Seconds before the first retry, doubled after every failed attempt
+POLADS_OUTBOX_RETRY_DELAY = env.int("POLADS_OUTBOX_RETRY_DELAY", 30)
+POLADS_OUTBOX_MAX_RETRY_DELAY = env.int("POLADS_OUTBOX_MAX_RETRY_DELAY", 60 * 60)
+# Seconds a claimed entry is hidden from other workers while it is being sent
+POLADS_OUTBOX_LEASE = env.int("POLADS_OUTBOX_LEASE", 5 * 60)
+
+# Spend-change digests of the send_spend_alerts command. Spend over the last
+# POLADS_ALERT_WINDOW_DAYS is compared with the previous run, and a change is
+# reported when it is both POLADS_ALERT_MIN_CHANGE dollars and
+# POLADS_ALERT_MIN_RATIO of the previous spend.
+POLADS_ALERT_DEFAULT_REGION = env.str("POLADS_ALERT_DEFAULT_REGION", "US")
+POLADS_ALERT_WINDOW_DAYS = env.int("POLADS_ALERT_WINDOW_DAYS", 7)
+POLADS_ALERT_MIN_CHANGE = env.float("POLADS_ALERT_MIN_CHANGE", 100)
+POLADS_ALERT_MIN_RATIO = env.float("POLADS_ALERT_MIN_RATIO", 0.25)
+# Digests handed to the mail connection at once
+POLADS_ALERT_BATCH_SIZE = env.int("POLADS_ALERT_BATCH_SIZE", 500)
 
 if DEBUG:
     # output email to console instead of sending
-    EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+    EMAIL_OUTBOX_BACKEND = "django.core.mail.backends.console.EmailBackend"
+    if not EMAIL_QUEUE:
+        EMAIL_BACKEND = EMAIL_OUTBOX_BACKEND
 
 FE_URL = env.str("FE_URL", "")
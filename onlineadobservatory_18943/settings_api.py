@@ -0,0 +1,49 @@
+"""
+API-only settings for workers that serve the polads API routes.
+
+Leaves out the admin, allauth and rest_auth with the account routes of
+home.api.v1 (signup, login, password reset), bootstrap4,
+django_extensions, drf_yasg, the HTML pages and the middleware they need,
+so that workers start faster and use less memory. API tokens are still
+accepted. The home.api.v1 routes are served by workers with the full
+settings. Select it with
+DJANGO_SETTINGS_MODULE=onlineadobservatory_18943.settings_api; migrations
+and other management commands still run with the full settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE
+
+API_UNUSED_APPS = {
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'rest_auth',
+    'rest_auth.registration',
+    'bootstrap4',
+    'allauth',
+    'allauth.account',
+    'allauth.socialaccount',
+    'allauth.socialaccount.providers.google',
+    'django_extensions',
+    'drf_yasg',
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_UNUSED_APPS]
+
+API_UNUSED_MIDDLEWARE = {
+    # DRF enforces CSRF itself for session-authenticated API calls
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+}
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in API_UNUSED_MIDDLEWARE]
+
+ROOT_URLCONF = 'onlineadobservatory_18943.urls_api'
+
+AUTHENTICATION_BACKENDS = ('django.contrib.auth.backends.ModelBackend',)
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,  # noqa: F405
+    DEFAULT_RENDERER_CLASSES=['rest_framework.renderers.JSONRenderer'],
+)
@@ -16,9 +16,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include, re_path
 from allauth.account.views import confirm_email
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+
+from onlineadobservatory_18943.schema import PrebuiltSchemaView
 
 urlpatterns = [
     path("", include("home.urls")),
@@ -37,16 +36,7 @@ admin.site.site_header = "OnlineAdObservatory"
 admin.site.site_title = "OnlineAdObservatory Admin Portal"
 admin.site.index_title = "OnlineAdObservatory Admin"
 
-# swagger
-schema_view = get_schema_view(
-    openapi.Info(
-        title="OnlineAdObservatory API",
-        default_version="v1",
-        description="API documentation for OnlineAdObservatory App",
-    ),
-    public=True,
-)
-
+# swagger, served from the prebuilt schema
 urlpatterns += [
-    path("api-docs/", schema_view.with_ui("swagger", cache_timeout=0), name="api_docs")
+    path("api-docs/", PrebuiltSchemaView.with_ui("swagger", cache_timeout=0), name="api_docs")
 ]
@@ -0,0 +1,6 @@
+"""URL configuration of the API-only settings profile, see settings_api.py."""
+from django.urls import path, include
+
+urlpatterns = [
+    path("api/v1/", include("polads.api.v1.urls")),
+]
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'onlineadobservatory_18943.settings')
 
 application = get_wsgi_application()
+
+from polads.apps import start_background_refresh  # noqa: E402
+
+start_background_refresh()
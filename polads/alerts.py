@@ -0,0 +1,201 @@
+"""Spend-change digests for notification subscribers.
+
+Subscriptions are reduced to the distinct (page, region, topic) keys they
+follow, so each key is fetched from Polads once however many users follow
+it. The recent spend of each key is compared with its SpendSnapshot, the
+spend subscribers were last alerted on, and every subscriber of a key
+that changed materially gets one digest email covering all of their keys.
+"""
+import logging
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import requests
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from polads.client import get_client, get_executor
+from polads.models import NotificationSubscription, Page, SpendSnapshot
+
+logger = logging.getLogger(__name__)
+
+PAGE_ROUTE = 'spend_by_time_period/of_page/<int:page_id>/of_region/<slug:region_name>'
+TOPIC_ROUTE = 'spend_by_time_period/of_topic/<slug:topic_name>/of_region/<slug:region_name>'
+
+
+def alert_key(page_id, region, topic):
+    """Key of the spend a subscription follows, or None if it follows none.
+
+    A page subscription follows the page whatever its topic.
+    """
+    region = region or settings.POLADS_ALERT_DEFAULT_REGION
+    if page_id is not None:
+        return (page_id, region, '')
+    if topic:
+        return (None, region, topic)
+    return None
+
+
+def subscription_keys():
+    rows = (
+        NotificationSubscription.objects.filter(removed_at__isnull=True)
+        .values_list('page_id', 'region', 'topic').distinct()
+    )
+    keys = {alert_key(*row) for row in rows}
+    keys.discard(None)
+    return keys
+
+
+def fetch_spend(key, start_date):
+    """Spend of a key from ``start_date`` on."""
+    page_id, region, topic = key
+    if page_id is not None:
+        path, route = f'/spend_by_time_period/of_page/{page_id}/of_region/{region}', PAGE_ROUTE
+    else:
+        path, route = f'/spend_by_time_period/of_topic/{topic}/of_region/{region}', TOPIC_ROUTE
+    response = get_client().get(path, params={'start_date': start_date.isoformat()}, route=route)
+    response.raise_for_status()
+    return sum(float(point['spend']) for point in response.json()['spend_in_timeperiod'])
+
+
+def fetch_all(keys):
+    """Spend of each key, fetched concurrently; keys that failed are left out."""
+    keys = sorted(keys, key=str)
+    start_date = date.today() - timedelta(days=settings.POLADS_ALERT_WINDOW_DAYS)
+
+    def fetch(key):
+        try:
+            return fetch_spend(key, start_date)
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            logger.warning("Fetching spend of %s failed: %s", key, e)
+            return None
+
+    return {
+        key: spend
+        for key, spend in zip(keys, get_executor().map(fetch, keys))
+        if spend is not None
+    }
+
+
+def is_material(previous, current):
+    change = abs(current - previous)
+    return (change >= settings.POLADS_ALERT_MIN_CHANGE
+            and change >= settings.POLADS_ALERT_MIN_RATIO * previous)
+
+
+def diff_snapshots(spend, keys):
+    """Compare the new spend of every key with the spend last alerted on.
+
+    Returns ``(changes, snapshots, stale)``: ``{key: (previous, current)}``
+    of the keys that changed materially, the stored snapshots of followed
+    keys and the ids of snapshots nobody follows anymore. Keys seen for the
+    first time have no change yet.
+    """
+    snapshots = {}
+    stale = []
+    for snapshot in SpendSnapshot.objects.iterator():
+        key = (snapshot.page_id, snapshot.region, snapshot.topic)
+        if key in keys:
+            snapshots[key] = snapshot
+        else:
+            stale.append(snapshot.pk)
+
+    changes = {
+        key: (snapshots[key].spend, current)
+        for key, current in spend.items()
+        if key in snapshots and is_material(snapshots[key].spend, current)
+    }
+    return changes, snapshots, stale
+
+
+@transaction.atomic
+def save_snapshots(spend, changes, snapshots, stale):
+    """Record the alerted spend and the spend of new keys, drop unfollowed keys.
+
+    Small changes are not recorded, so gradual drift adds up until it is
+    material.
+    """
+    now = timezone.now()
+    SpendSnapshot.objects.filter(pk__in=stale).delete()
+    alerted = []
+    for key, (previous, current) in changes.items():
+        snapshot = snapshots[key]
+        snapshot.spend = current
+        snapshot.updated_at = now
+        alerted.append(snapshot)
+    SpendSnapshot.objects.bulk_update(alerted, ['spend', 'updated_at'], batch_size=1000)
+    SpendSnapshot.objects.bulk_create([
+        SpendSnapshot(page_id=page_id, region=region, topic=topic, spend=current)
+        for (page_id, region, topic), current in spend.items()
+        if (page_id, region, topic) not in snapshots
+    ], batch_size=1000)
+
+
+def digests(changes):
+    """Yield ``(email, [(key, previous, current)])`` of every subscriber of a changed key."""
+    rows = (
+        NotificationSubscription.objects.filter(removed_at__isnull=True).exclude(email='')
+        .order_by('email')
+        .values_list('email', 'page_id', 'region', 'topic')
+        .iterator(chunk_size=2000)
+    )
+    for email, subscriptions in groupby(rows, key=itemgetter(0)):
+        keys = {alert_key(*subscription[1:]) for subscription in subscriptions}
+        followed = sorted((key for key in keys if key in changes), key=str)
+        if followed:
+            yield email, [(key, *changes[key]) for key in followed]
+
+
+def render_digest(email, items, page_names):
+    lines = ["Spend changed on ads you follow:", ""]
+    for (page_id, region, topic), previous, current in items:
+        if page_id is not None:
+            subject = page_names.get(page_id) or f"page {page_id}"
+        else:
+            subject = f"topic {topic}"
+        change = f"{(current - previous) / previous:+.0%}" if previous else "new"
+        lines.append(
+            f"- {subject} in {region}: ${previous:,.0f} -> ${current:,.0f} ({change}) "
+            f"over the last {settings.POLADS_ALERT_WINDOW_DAYS} days"
+        )
+    return EmailMessage(
+        subject="Ad spend changes on your notifications",
+        body="\n".join(lines),
+        to=[email],
+    )
+
+
+def send_digests(changes):
+    """Send the digests in batches over one mail connection, returns the number sent."""
+    page_names = dict(
+        Page.objects.filter(page_id__in=[page_id for page_id, _, _ in changes if page_id is not None])
+        .values_list('page_id', 'page_name')
+    )
+    sent = 0
+    batch = []
+    with get_connection() as connection:
+        for email, items in digests(changes):
+            batch.append(render_digest(email, items, page_names))
+            if len(batch) >= settings.POLADS_ALERT_BATCH_SIZE:
+                sent += connection.send_messages(batch) or 0
+                batch = []
+        if batch:
+            sent += connection.send_messages(batch) or 0
+    return sent
+
+
+def run_alerts():
+    """Fetch, diff and send; returns ``(keys, changed, digests)`` counts.
+
+    Snapshots are only saved once the digests were handed to the mail
+    connection, so changes are alerted again if sending fails.
+    """
+    keys = subscription_keys()
+    spend = fetch_all(keys)
+    changes, snapshots, stale = diff_snapshots(spend, keys)
+    sent = send_digests(changes) if changes else 0
+    save_snapshots(spend, changes, snapshots, stale)
+    return len(keys), len(changes), sent
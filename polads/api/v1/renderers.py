@@ -0,0 +1,23 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from polads.metrics import metrics
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer recording its encoding time by route template."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        content = super().render(data, accepted_media_type, renderer_context)
+        request = (renderer_context or {}).get('request')
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            metrics.observe(
+                'polads_json_duration_seconds',
+                time.perf_counter() - started,
+                route=match.route,
+                stage='encode',
+            )
+        return content
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import serializers
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    path = serializers.CharField()
+    params = serializers.DictField(required=False, default=dict)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchRequestSerializer(many=True)
+
+    def validate_requests(self, requests):
+        if not requests:
+            raise serializers.ValidationError(_("At least one request is required."))
+        if len(requests) > settings.POLADS_BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                _("At most %(limit)d requests can be batched.")
+                % {'limit': settings.POLADS_BATCH_MAX_REQUESTS}
+            )
+        return requests
+
+
+class ArchiveIdsSerializer(serializers.Serializer):
+    archive_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=0),
+        allow_empty=False,
+        max_length=settings.POLADS_BULK_ARCHIVE_IDS_MAX
+    )
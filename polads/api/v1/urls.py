@@ -64,6 +64,10 @@ urlpatterns = [
         'archive-id/<int:archive_id>/cluster',
         views.ProxyPoladsView.as_view()
     ),
+    path(  # Clusters of many archive ids in one call
+        'archive-id/clusters',
+        views.ArchiveClustersView.as_view()
+    ),
     path(  # Topics
         'topics',
         views.ProxyPoladsView.as_view()
@@ -91,5 +95,21 @@ urlpatterns = [
     path(  # Remove Notification
         'notifications/remove/<int:notification_id>',
         views.ProxyPoladsView.as_view()
+    ),
+    path(  # Page dashboard: spend, targeting and topics of a page in one document
+        'page_summary/of_page/<int:page_id>/of_region/<slug:region_name>',
+        views.PageSummaryView.as_view()
+    ),
+    path(  # Several proxied routes fetched concurrently in one call
+        'batch',
+        views.BatchPoladsView.as_view()
+    ),
+    path(  # Upstream connection pool stats of this worker
+        'polads/stats',
+        views.PoladsStatsView.as_view()
+    ),
+    path(  # Prometheus metrics of this worker
+        'polads/metrics',
+        views.PoladsMetricsView.as_view()
     )
 ]
@@ -1,47 +1,609 @@
-from django.conf import settings
+import hashlib
+import json
+import time
+from concurrent.futures import wait
+from functools import partial
+from itertools import chain
 
 import requests
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from polads.autocomplete import AUTOCOMPLETE_ROUTE, autocomplete_index
+from polads.bulkhead import BulkheadFull, upstream_bulkhead
+from polads.cache import (
+    CachedResponse,
+    RawResponse,
+    cache_key,
+    immutable_cache,
+    response_cache,
+    ttl_for,
+    validators,
+)
+from polads.api.v1.renderers import TimedJSONRenderer
+from polads.api.v1.serializers import ArchiveIdsSerializer, BatchSerializer
+from polads.client import get_client, get_executor
+from polads.metrics import metrics
+from polads.notifications import (
+    NOTIFICATION_ROUTES,
+    add_subscription,
+    list_subscriptions,
+    remove_subscription,
+    serialize,
+)
+from polads.reference import REFERENCE_ROUTES, reference_data
+from polads.replica import LOCAL_ROUTES, local_response
+from polads.search import InvalidSearch, ad_search_index
+from polads.singleflight import upstream_calls
+from polads.stats import hot_keys
+
+UPSTREAM_ERRORS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    # A body cut short or corrupted while it was read
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ContentDecodingError,
+    BulkheadFull,
+)
+
 
 class ProxyPoladsView(APIView):
-    base_api_url = settings.POLADS_BASE_API_URL
+    route_prefix = 'api/v1/'
+    renderer_classes = [TimedJSONRenderer] + [
+        renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, JSONRenderer)
+    ]
+    # Bulkhead queue of the requesting user, None when not serving a request
+    tenant = None
 
-    def _request(self, path, query_parameters):
-        return requests.get(
-            f"{self.base_api_url}{path}",
-            params=query_parameters,
-            headers={
-                'Authorization': settings.POLADS_API_TOKEN
-            }
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user = request.user
+        if not user.is_authenticated:
+            self.tenant = 'anonymous'
+        else:
+            self.tenant = user.organisation or f'user:{user.pk}'
+
+    def _route(self, request):
+        """Route template of polads/api/v1/urls.py matched by the request."""
+        return request.resolver_match.route[len(self.route_prefix):]
+
+    def _request(self, path, query_parameters, route=None, headers=None):
+        client = get_client()
+        fetch = partial(self._admitted_get, path, params=query_parameters, route=route, headers=headers)
+        # Concurrent identical requests share a single upstream fetch
+        try:
+            return upstream_calls.do(
+                (
+                    cache_key(path, query_parameters),
+                    client.token,
+                    tuple(sorted((headers or {}).items()))
+                ),
+                fetch
+            )
+        except BulkheadFull as e:
+            if e.tenant == self.tenant:
+                raise
+            # Joined the call of another tenant whose queue was full; this
+            # tenant is admitted through its own queue instead
+            return fetch()
+
+    def _admitted_get(self, path, **kwargs):
+        with upstream_bulkhead.admit(self.tenant):
+            return get_client().get(path, **kwargs)
+
+    def _conditional(self, request, response, etag, last_modified):
+        """Tag the response and turn it into a 304 if the client copy is current.
+
+        Without a request, e.g. for a batch item, the response is only tagged.
+        """
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        if request is None:
+            return response
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+            response=response
         )
 
-    def get(self, request, *args, **kwargs):
-        # Get Polads API path from current path
-        polads_path = request.path[7:]
+    def _revalidation_headers(self, cached):
+        headers = {}
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = http_date(cached.last_modified)
+        return headers
 
+    def _upstream_error(self, exception):
+        if isinstance(exception, BulkheadFull):
+            return Response(
+                'Too many concurrent Polads requests, retry later.',
+                status=503,
+                headers={'Retry-After': str(exception.retry_after)}
+            )
+        if isinstance(exception, requests.exceptions.Timeout):
+            return Response(
+                'Polads API timed out.',
+                status=504
+            )
+        return Response(
+            'Polads API is unreachable.',
+            status=502
+        )
+
+    def _passthrough(self, request, path, route, query_parameters):
+        """Stream the upstream body as-is, without decoding it as JSON."""
+        # The body is never buffered, so only the upstream validators are usable
+        meta = request.META if request is not None else {}
+        headers = {
+            header: meta[meta_key]
+            for header, meta_key in (
+                ('If-None-Match', 'HTTP_IF_NONE_MATCH'),
+                ('If-Modified-Since', 'HTTP_IF_MODIFIED_SINCE'),
+            )
+            if meta_key in meta
+        }
         try:
-            # Request to Polads API
+            upstream = self._admitted_get(
+                path,
+                params=query_parameters,
+                route=route,
+                headers=headers,
+                stream=True
+            )
+        except UPSTREAM_ERRORS as e:
+            return self._upstream_error(e)
+        return self._streaming_response(upstream, upstream.iter_content(settings.POLADS_STREAM_CHUNK_SIZE))
+
+    def _streaming_response(self, upstream, chunks):
+        """Relay the ``chunks`` of a streamed upstream response."""
+        def stream_body():
+            try:
+                yield from chunks
+            finally:
+                # Hand the connection back to the pool even if the client went away
+                upstream.close()
+
+        response = StreamingHttpResponse(
+            stream_body(),
+            status=upstream.status_code,
+            content_type=upstream.headers.get('Content-Type', 'application/json')
+        )
+        # requests transparently decompresses, so a compressed length is wrong
+        if 'Content-Length' in upstream.headers and 'Content-Encoding' not in upstream.headers:
+            response['Content-Length'] = upstream.headers['Content-Length']
+        for header in ('ETag', 'Last-Modified'):
+            if header in upstream.headers:
+                response[header] = upstream.headers[header]
+        return response
+
+    def _fetch(self, path, query_parameters, route, refresh=False):
+        """Cached and coalesced upstream GET, returned as a CachedResponse.
+
+        Upstream error and 204 responses carry the response text as data and
+        no validators. Timeouts and connection errors are raised. ``refresh``
+        skips fresh cache entries so that they are fetched again.
+        """
+        ttl = ttl_for(route)
+        key = cache_key(path, query_parameters)
+        stale = None
+        if ttl:
+            cached = None if refresh else response_cache.get(key)
+            if cached is not None:
+                metrics.increment('polads_cache_requests_total', route=route, result='hit')
+                return cached
+            stale = response_cache.get_stale(key)
+            metrics.increment(
+                'polads_cache_requests_total', route=route, result='stale' if stale else 'miss'
+            )
+
+        try:
+            # Request to Polads API, revalidating an expired cache entry if any
             req_polads = self._request(
-                polads_path,
-                request.GET
+                path,
+                query_parameters,
+                route=route,
+                headers=self._revalidation_headers(stale) if stale else None
             )
             req_polads.raise_for_status()
         except requests.exceptions.HTTPError as e:
-            return Response(
-                e.response.text,
-                status=e.response.status_code
-            )
+            return CachedResponse(e.response.status_code, e.response.text, None, None)
 
         # Handle 204 no content error on json decode
         if req_polads.status_code == 204:
-            return Response(
-                req_polads.text,
-                status=req_polads.status_code
+            return CachedResponse(req_polads.status_code, req_polads.text, None, None)
+
+        # Upstream confirmed the expired entry is still current
+        if req_polads.status_code == 304 and stale is not None:
+            response_cache.touch(key, ttl=ttl)
+            return stale
+
+        etag, last_modified = validators(req_polads)
+        started = time.perf_counter()
+        data = req_polads.json()
+        metrics.observe(
+            'polads_json_duration_seconds',
+            time.perf_counter() - started,
+            route=route,
+            stage='decode'
+        )
+        result = CachedResponse(req_polads.status_code, data, etag, last_modified)
+        if ttl and req_polads.status_code == 200:
+            response_cache.set(key, result, ttl=ttl, size=len(req_polads.content))
+        return result
+
+    def _fetch_immutable(self, path, query_parameters, route, stream_large=False):
+        """Coalesced upstream GET of an immutable route, kept undecoded.
+
+        With ``stream_large``, the body is read as a stream instead, and a
+        body over POLADS_IMMUTABLE_CACHE_MAX_ENTRY_BYTES, which could not be
+        cached anyway, is returned as a StreamingHttpResponse unbuffered.
+        """
+        key = cache_key(path, query_parameters)
+        cached = immutable_cache.get(key)
+        metrics.increment(
+            'polads_cache_requests_total', route=route, result='miss' if cached is None else 'hit'
+        )
+        if cached is not None:
+            return cached
+
+        if stream_large:
+            upstream = self._admitted_get(path, params=query_parameters, route=route, stream=True)
+            content = self._read_cacheable(upstream)
+            if content is None:
+                return self._streaming_response(
+                    upstream, upstream.iter_content(settings.POLADS_STREAM_CHUNK_SIZE)
+                )
+            if not isinstance(content, bytes):
+                # Over the cap once read, relay what was read and the rest
+                return self._streaming_response(upstream, content)
+            etag = upstream.headers.get('ETag')
+            if not etag or etag.startswith('W/'):
+                etag = f'"{hashlib.sha1(content).hexdigest()}"'
+            status_code, headers = upstream.status_code, upstream.headers
+        else:
+            req_polads = self._request(path, query_parameters, route=route)
+            etag, _ = validators(req_polads)
+            status_code, headers, content = req_polads.status_code, req_polads.headers, req_polads.content
+
+        result = RawResponse(
+            status_code,
+            content,
+            headers.get('Content-Type', 'application/json'),
+            etag
+        )
+        if status_code == 200 and len(content) <= settings.POLADS_IMMUTABLE_CACHE_MAX_ENTRY_BYTES:
+            immutable_cache.set(key, result, size=len(key) + len(content))
+        return result
+
+    def _read_cacheable(self, upstream):
+        """Body of a streamed response if it fits in an immutable cache entry.
+
+        Returns None when Content-Length already says it does not fit, and an
+        iterator over the whole body when it turned out not to fit while read.
+        The response is closed once read in full, or when reading fails.
+        """
+        limit = settings.POLADS_IMMUTABLE_CACHE_MAX_ENTRY_BYTES
+        length = upstream.headers.get('Content-Length', '')
+        if 'Content-Encoding' not in upstream.headers and length.isdigit() and int(length) > limit:
+            return None
+        chunks = upstream.iter_content(settings.POLADS_STREAM_CHUNK_SIZE)
+        read = []
+        size = 0
+        relayed = False
+        try:
+            for chunk in chunks:
+                read.append(chunk)
+                size += len(chunk)
+                if size > limit:
+                    relayed = True
+                    return chain(read, chunks)
+        finally:
+            if not relayed:
+                upstream.close()
+        return b''.join(read)
+
+    def _notifications(self, route, kwargs, query_parameters):
+        """Answer a notifications route from the local subscription store."""
+        if route == 'notifications/add':
+            return Response(serialize(add_subscription(query_parameters)))
+        if route == 'notifications/remove/<int:notification_id>':
+            if not remove_subscription(kwargs['notification_id']):
+                return Response({'detail': 'Not found.'}, status=404)
+            return Response(status=204)
+        try:
+            return Response(list_subscriptions(kwargs['email']))
+        except requests.exceptions.RequestException as e:
+            return self._upstream_error(e)
+
+    def _dispatch(self, request, polads_path, route, kwargs, query_parameters):
+        """Answer a route from local data when possible, else from Polads.
+
+        Shared by single requests and batch items so that both get the same
+        answer; batch items pass no request and are never turned into 304s.
+        """
+        if route == 'getads' and ad_search_index is not None and ad_search_index.is_ready():
+            try:
+                body = ad_search_index.search(query_parameters)
+            except InvalidSearch as e:
+                return Response({'detail': str(e)}, status=400)
+            if body is not None:
+                return HttpResponse(body, content_type='application/json')
+
+        if route in settings.POLADS_PASSTHROUGH_ROUTES:
+            return self._passthrough(request, polads_path, route, query_parameters)
+
+        if route in settings.POLADS_IMMUTABLE_ROUTES:
+            try:
+                result = self._fetch_immutable(polads_path, query_parameters, route, stream_large=True)
+            except UPSTREAM_ERRORS as e:
+                return self._upstream_error(e)
+            if isinstance(result, StreamingHttpResponse):
+                return result
+            response = HttpResponse(
+                result.content,
+                status=result.status_code,
+                content_type=result.content_type
             )
+            if result.status_code != 200:
+                return response
+            return self._conditional(request, response, result.etag, None)
 
-        return Response(
-            req_polads.json(),
-            status=req_polads.status_code
+        if route in REFERENCE_ROUTES and not query_parameters:
+            result = reference_data.get(polads_path)
+            if result is not None:
+                return self._conditional(
+                    request,
+                    Response(result.data, status=result.status_code),
+                    result.etag,
+                    result.last_modified
+                )
+
+        if route == AUTOCOMPLETE_ROUTE:
+            results = autocomplete_index.search(
+                query_parameters.get('q', ''),
+                limit=settings.POLADS_AUTOCOMPLETE_LIMIT
+            )
+            if results is not None:
+                return Response({'data': results})
+
+        if settings.POLADS_LOCAL_SPEND and route in LOCAL_ROUTES:
+            data = local_response(route, kwargs, query_parameters)
+            if data is not None:
+                return Response(data)
+
+        if settings.POLADS_LOCAL_NOTIFICATIONS and route in NOTIFICATION_ROUTES:
+            return self._notifications(route, kwargs, query_parameters)
+
+        if ttl_for(route):
+            # Feeds the warm_polads_cache command
+            hot_keys.record(route, cache_key(polads_path, query_parameters))
+
+        try:
+            result = self._fetch(polads_path, query_parameters, route)
+        except UPSTREAM_ERRORS as e:
+            return self._upstream_error(e)
+
+        response = Response(result.data, status=result.status_code)
+        if result.etag is None:
+            return response
+        return self._conditional(request, response, result.etag, result.last_modified)
+
+    def get(self, request, *args, **kwargs):
+        # Get Polads API path from current path
+        polads_path = request.path[7:]
+        return self._dispatch(request, polads_path, self._route(request), kwargs, request.GET)
+
+
+class BatchPoladsView(ProxyPoladsView):
+    """Fetch several Polads routes concurrently in a single call.
+
+    Each item is resolved against polads/api/v1/urls.py and answered like the
+    same single GET, local data included, with its own status, in the order
+    given. Streamed routes are buffered here. Routes that change data are
+    rejected with a 400 item, so that a batch can be retried safely.
+    """
+    http_method_names = ['post', 'options']
+    write_routes = (
+        'notifications/add',
+        'notifications/remove/<int:notification_id>',
+    )
+
+    def _resolve(self, path):
+        """URL match of a proxied sub-path, or None if it is not one."""
+        try:
+            match = resolve(f"/{path.lstrip('/')}", urlconf='polads.api.v1.urls')
+        except Resolver404:
+            return None
+        if getattr(match.func, 'view_class', None) is not ProxyPoladsView:
+            return None
+        return match
+
+    def _body(self, response):
+        """Data of an item response, decoding JSON bodies of plain responses."""
+        if isinstance(response, Response):
+            return response.data
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        if response.get('Content-Type', '').startswith('application/json'):
+            try:
+                return json.loads(content)
+            except ValueError:
+                pass
+        return content.decode(errors='replace')
+
+    def _fetch_item(self, item):
+        path = f"/{item['path'].lstrip('/')}"
+        match = self._resolve(path)
+        if match is None:
+            return {'path': item['path'], 'status': 404, 'body': 'Not a Polads route.'}
+        if match.route in self.write_routes:
+            return {'path': item['path'], 'status': 400, 'body': 'Only read routes can be batched.'}
+
+        query_parameters = QueryDict(mutable=True)
+        for name, value in item['params'].items():
+            query_parameters.setlist(
+                name,
+                [str(v) for v in value] if isinstance(value, list) else [str(value)]
+            )
+
+        # Items may read the database on the fan-out threads, which outlive
+        # requests; their connections are recycled like a request's
+        close_old_connections()
+        try:
+            response = self._dispatch(None, path, match.route, match.kwargs, query_parameters)
+            return {'path': item['path'], 'status': response.status_code, 'body': self._body(response)}
+        finally:
+            close_old_connections()
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        responses = get_executor().map(
+            self._fetch_item,
+            serializer.validated_data['requests']
         )
+        return Response({'responses': list(responses)})
+
+
+class ArchiveClustersView(ProxyPoladsView):
+    """Resolve many archive ids to their ad clusters in one call.
+
+    Cached ids are answered from the immutable cache and the misses are
+    fetched concurrently. Ids that fail are listed under ``errors``.
+    """
+    http_method_names = ['post', 'options']
+    cluster_route = 'archive-id/<int:archive_id>/cluster'
+
+    def _resolve(self, archive_id):
+        try:
+            result = self._fetch_immutable(
+                f'/archive-id/{archive_id}/cluster', {}, self.cluster_route
+            )
+        except UPSTREAM_ERRORS as e:
+            error = self._upstream_error(e)
+            return error.status_code, error.data
+        if result.status_code != 200:
+            return result.status_code, result.content.decode(errors='replace')
+        return 200, json.loads(result.content)
+
+    def post(self, request, *args, **kwargs):
+        serializer = ArchiveIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        archive_ids = list(dict.fromkeys(serializer.validated_data['archive_ids']))
+
+        clusters = {}
+        errors = {}
+        for archive_id, (status, body) in zip(
+            archive_ids, get_executor().map(self._resolve, archive_ids)
+        ):
+            if status == 200:
+                clusters[str(archive_id)] = body
+            else:
+                errors[str(archive_id)] = {'status': status, 'detail': body}
+        return Response({'clusters': clusters, 'errors': errors})
+
+
+class PageSummaryView(ProxyPoladsView):
+    """Everything the page dashboard shows for a page in a region, in one document.
+
+    The sub-requests run in parallel; those that fail or do not finish in
+    POLADS_PAGE_SUMMARY_TIMEOUT are reported under ``errors`` and the
+    document is marked ``partial``. Only complete documents are cached.
+    """
+    sections = (
+        ('total_spend', 'total_spend/of_page/<int:page_id>/of_region/<slug:region_name>'),
+        ('spend_by_time_period', 'spend_by_time_period/of_page/<int:page_id>/of_region/<slug:region_name>'),
+        ('total_spend_by_purpose', 'total_spend/by_purpose/of_page/<int:page_id>'),
+        ('total_spend_by_targeting', 'total_spend/by_targeting/of_page/<int:page_id>'),
+        ('targeting', 'targeting/of_page/<int:page_id>'),
+        ('spend_by_time_period_by_topic', 'spend_by_time_period/by_topic/of_page/<int:page_id>'),
+    )
+
+    def _section_path(self, route, page_id, region_name):
+        return '/' + route.replace(
+            '<int:page_id>', str(page_id)
+        ).replace(
+            '<slug:region_name>', region_name
+        )
+
+    def get(self, request, page_id, region_name):
+        route = self._route(request)
+        ttl = ttl_for(route)
+        key = cache_key(request.path[7:], request.GET)
+        if ttl:
+            cached = response_cache.get(key)
+            if cached is not None:
+                return Response(cached.data, status=cached.status_code)
+
+        futures = {
+            get_executor().submit(
+                self._fetch,
+                self._section_path(section_route, page_id, region_name),
+                request.GET,
+                section_route
+            ): name
+            for name, section_route in self.sections
+        }
+        done, not_done = wait(futures, timeout=settings.POLADS_PAGE_SUMMARY_TIMEOUT)
+
+        summary = {'page_id': page_id, 'region_name': region_name}
+        errors = {}
+        for future in done:
+            name = futures[future]
+            try:
+                result = future.result()
+            except UPSTREAM_ERRORS as e:
+                error = self._upstream_error(e)
+                errors[name] = {'status': error.status_code, 'detail': error.data}
+                continue
+            if result.status_code >= 400:
+                errors[name] = {'status': result.status_code, 'detail': result.data}
+            else:
+                summary[name] = result.data
+        for future in not_done:
+            # Left running: a late result still lands in the route cache
+            errors[futures[future]] = {'status': 504, 'detail': 'Polads API timed out.'}
+
+        summary['errors'] = errors
+        summary['partial'] = bool(errors)
+        if ttl and not errors:
+            response_cache.set(key, CachedResponse(200, summary, None, None), ttl=ttl)
+        return Response(summary)
+
+
+class PoladsStatsView(APIView):
+    """Connection pool, cache and coalescing stats of this worker."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        stats = get_client().stats()
+        stats['cache'] = response_cache.stats()
+        stats['immutable_cache'] = immutable_cache.stats()
+        stats['coalescing'] = upstream_calls.stats()
+        stats['bulkhead'] = upstream_bulkhead.stats()
+        return Response(stats)
+
+
+class PoladsMetricsView(APIView):
+    """Request, upstream and cache metrics of this worker, for Prometheus."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4')
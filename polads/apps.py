@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PoladsConfig(AppConfig):
     name = 'polads'
+
+
+def start_background_refresh():
+    """Load the in-memory indexes of the polads app and keep them fresh.
+
+    Called by the web entrypoint only, so that management commands never
+    start the refresh threads.
+    """
+    if not settings.POLADS_BACKGROUND_REFRESH:
+        return
+    from polads.autocomplete import autocomplete_index
+    from polads.reference import reference_data
+    autocomplete_index.start(settings.POLADS_AUTOCOMPLETE_REFRESH_INTERVAL)
+    reference_data.start(
+        settings.POLADS_REFERENCE_REFRESH_INTERVAL,
+        jitter=settings.POLADS_REFERENCE_REFRESH_JITTER
+    )
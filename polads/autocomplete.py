@@ -0,0 +1,128 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.apps import apps
+from django.db import close_old_connections
+from django.db.models import Sum
+
+from polads.models import Page
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_ROUTE = 'search/pages_type_ahead/autocomplete/funding_entities'
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+class PrefixIndex:
+    """Sorted array of names, searched by binary search on word prefixes.
+
+    Every word of a name starts a key, so "trump" finds "Donald J. Trump for
+    President". Matches are ranked by weight, then by shorter names. To keep
+    a lookup fast, only the first ``scan_limit`` keys of a prefix, in
+    alphabetical order, are ranked; a short prefix matching more keys than
+    that may miss heavier names further down.
+    """
+
+    def __init__(self, entries):
+        keys = []
+        for name, kind, page_id, weight in entries:
+            words = normalize(name).split(' ')
+            for position in range(len(words)):
+                keys.append((' '.join(words[position:]), name, kind, page_id, weight))
+        keys.sort()
+        self._keys = keys
+        self._prefixes = [key[0] for key in keys]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def search(self, prefix, limit=10, scan_limit=5000):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = {}
+        position = bisect_left(self._prefixes, prefix)
+        end = min(len(self._keys), position + scan_limit)
+        while position < end and self._prefixes[position].startswith(prefix):
+            key, name, kind, page_id, weight = self._keys[position]
+            matches[(kind, name, page_id)] = weight
+            position += 1
+        ranked = heapq.nsmallest(
+            limit, matches.items(), key=lambda item: (-item[1], len(item[0][1]), item[0][1])
+        )
+        return [
+            {'type': kind, 'name': name, 'page_id': page_id}
+            for (kind, name, page_id), weight in ranked
+        ]
+
+
+class AutocompleteIndex:
+    """Funding entity and page name index of the local replica.
+
+    Only the pages the replica syncs, at most POLADS_REPLICA_MAX_PAGES per
+    region, are indexed, so names of other pages are never suggested.
+
+    ``search`` returns None until the index has been loaded, so that callers
+    fall back to the Polads API on a cold index.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        pages = Page.objects.annotate(spend=Sum('spend_records__spend')).values_list(
+            'page_id', 'page_name', 'funding_entity', 'spend'
+        )
+        entries = []
+        for page_id, page_name, funding_entity, spend in pages:
+            if page_name:
+                entries.append((page_name, 'page', page_id, spend or 0))
+            if funding_entity:
+                entries.append((funding_entity, 'funding_entity', page_id, spend or 0))
+        index = PrefixIndex(entries)
+        # Swapping the reference is atomic, readers never see a partial index
+        self._index = index if len(index) else None
+        return len(index)
+
+    def search(self, prefix, limit=10):
+        index = self._index
+        if index is None:
+            return None
+        return index.search(prefix, limit)
+
+    def start(self, interval):
+        """Load in the background now and then every ``interval`` seconds."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._refresh_forever,
+                args=(interval,),
+                name='polads-autocomplete',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _refresh_forever(self, interval):
+        while not apps.ready:
+            time.sleep(0.1)
+        while True:
+            try:
+                self.load()
+            except Exception:
+                logger.exception("Loading the autocomplete index failed")
+            finally:
+                close_old_connections()
+            time.sleep(interval)
+
+
+autocomplete_index = AutocompleteIndex()
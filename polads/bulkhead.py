@@ -0,0 +1,126 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class BulkheadFull(Exception):
+    """The tenant's queue is full, or its request waited too long for a slot."""
+
+    def __init__(self, tenant, retry_after):
+        super().__init__(f"Too many queued Polads requests for {tenant!r}")
+        self.tenant = tenant
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('tag', 'granted')
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.granted = threading.Event()
+
+
+class Bulkhead:
+    """Cap on in-flight upstream requests, shared fairly between tenants.
+
+    Up to ``max_in_flight`` requests run at once. Others wait in a queue of
+    their tenant, and freed slots go to the queued request with the lowest
+    virtual finish time (weighted fair queueing): with weights 2 and 1, the
+    first tenant gets two slots for every slot of the second while both are
+    waiting. A tenant with ``max_queue`` waiting requests is turned away at
+    once, and a request that waits longer than ``queue_timeout`` gives up.
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout, retry_after=1, weights=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.weights = weights or {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queues = {}
+        self._finish_tags = {}
+        self._virtual_time = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _weight(self, tenant):
+        return max(float(self.weights.get(tenant, 1)), 0.001)
+
+    def acquire(self, tenant):
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queues:
+                self._in_flight += 1
+                self.admitted += 1
+                return
+            if len(self._queues.get(tenant, ())) >= self.max_queue:
+                self.rejected += 1
+                raise BulkheadFull(tenant, self.retry_after)
+            tag = max(self._virtual_time, self._finish_tags.get(tenant, 0.0)) + 1 / self._weight(tenant)
+            self._finish_tags[tenant] = tag
+            waiter = _Waiter(tag)
+            self._queues.setdefault(tenant, deque()).append(waiter)
+
+        if waiter.granted.wait(self.queue_timeout):
+            return
+        with self._lock:
+            # The slot may have been handed over between the timeout and here
+            if waiter.granted.is_set():
+                return
+            queue = self._queues[tenant]
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[tenant]
+            self.rejected += 1
+        raise BulkheadFull(tenant, self.retry_after)
+
+    def release(self):
+        with self._lock:
+            if not self._queues:
+                self._in_flight -= 1
+                return
+            # Hand the slot straight to the next waiter, in_flight is unchanged
+            tenant, queue = min(self._queues.items(), key=lambda item: item[1][0].tag)
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[tenant]
+            self._virtual_time = waiter.tag
+            if not self._queues:
+                self._finish_tags.clear()
+            self.admitted += 1
+            waiter.granted.set()
+
+    @contextmanager
+    def admit(self, tenant):
+        """Hold a slot for the block; a None tenant is never limited."""
+        if tenant is None:
+            yield
+            return
+        self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+                'queued': {tenant: len(queue) for tenant, queue in self._queues.items()},
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
+
+
+# Upstream requests made on behalf of API users of this worker
+upstream_bulkhead = Bulkhead(
+    max_in_flight=settings.POLADS_BULKHEAD_MAX_IN_FLIGHT,
+    max_queue=settings.POLADS_BULKHEAD_MAX_QUEUE,
+    queue_timeout=settings.POLADS_BULKHEAD_QUEUE_TIMEOUT,
+    retry_after=settings.POLADS_BULKHEAD_RETRY_AFTER,
+    weights=settings.POLADS_BULKHEAD_WEIGHTS,
+)
@@ -0,0 +1,240 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_http_date_safe
+
+
+# Routes whose responses are per-user or have side effects upstream
+NEVER_CACHE_PREFIXES = ('notifications/',)
+
+CachedResponse = namedtuple(
+    'CachedResponse', ['status_code', 'data', 'etag', 'last_modified']
+)
+# Undecoded upstream body, served as-is
+RawResponse = namedtuple(
+    'RawResponse', ['status_code', 'content', 'content_type', 'etag']
+)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    Memory is bounded both by number of entries and by the sum of the sizes
+    given on ``set``; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries, max_bytes=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= self.clock():
+                # Expired entries are kept until evicted so they can be revalidated
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        """Return an entry even if it has expired, e.g. to revalidate it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def size_of(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2] if entry is not None else 0
+
+    def touch(self, key, ttl=None):
+        """Give an existing, possibly expired, entry a fresh TTL."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            value, expires_at, size = entry
+            expires_at = self.clock() + ttl if ttl is not None else None
+            self._entries[key] = (value, expires_at, size)
+            self._entries.move_to_end(key)
+            return True
+
+    def set(self, key, value, ttl=None, size=0):
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = self.clock() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while (self.max_entries is not None and len(self._entries) > self.max_entries) or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        value, expires_at, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def cache_key(path, query_parameters):
+    """Canonical cache key: path plus the query string sorted by key and value."""
+    if hasattr(query_parameters, 'lists'):
+        items = [
+            (key, value)
+            for key, values in query_parameters.lists()
+            for value in values
+        ]
+    else:
+        items = list((query_parameters or {}).items())
+    if not items:
+        return path
+    return f"{path}?{urlencode(sorted(items))}"
+
+
+def validators(upstream):
+    """Strong ETag and Last-Modified timestamp of a buffered upstream response.
+
+    The upstream ETag is used when it is strong, a hash of the body otherwise.
+    """
+    etag = upstream.headers.get('ETag')
+    if not etag or etag.startswith('W/'):
+        etag = f'"{hashlib.sha1(upstream.content).hexdigest()}"'
+    return etag, parse_http_date_safe(upstream.headers.get('Last-Modified', ''))
+
+
+def ttl_for(route):
+    """Seconds a response of the route template may be cached, or None."""
+    if route.startswith(NEVER_CACHE_PREFIXES):
+        return None
+    return settings.POLADS_CACHE_TTLS.get(route, settings.POLADS_CACHE_DEFAULT_TTL)
+
+
+def shared_cache():
+    """The Django cache shared by all workers, or None if not configured."""
+    if 'polads' not in settings.CACHES:
+        return None
+    return caches['polads']
+
+
+class ResponseCache:
+    """In-process TTLCache in front of an optional shared Django cache.
+
+    The shared tier is the ``polads`` alias of ``CACHES`` when configured
+    (see POLADS_CACHE_URL). It lets every worker and management commands,
+    such as ``warm_polads_cache``, read and fill the same entries.
+    """
+    key_prefix = 'polads:response:'
+
+    def __init__(self, local):
+        self.local = local
+        self.shared_hits = 0
+
+    @property
+    def shared(self):
+        return shared_cache()
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        entry = self.shared.get(self.key_prefix + key)
+        if entry is None:
+            return None
+        value, expires_at, size = entry
+        ttl = expires_at - time.time()
+        if ttl <= 0:
+            return None
+        self.local.set(key, value, ttl=ttl, size=size)
+        self.shared_hits += 1
+        return value
+
+    def get_stale(self, key):
+        return self.local.get_stale(key)
+
+    def set(self, key, value, ttl=None, size=0):
+        self.local.set(key, value, ttl=ttl, size=size)
+        if self.shared is not None and ttl is not None:
+            self.shared.set(
+                self.key_prefix + key,
+                (value, time.time() + ttl, size),
+                timeout=ttl
+            )
+
+    def touch(self, key, ttl=None):
+        value = self.local.get_stale(key)
+        if value is None:
+            return False
+        self.set(key, value, ttl=ttl, size=self.local.size_of(key))
+        return True
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def clear(self):
+        """Empty the in-process tier; the shared tier expires on its own."""
+        self.local.clear()
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['shared'] = self.shared is not None
+        stats['shared_hits'] = self.shared_hits
+        return stats
+
+
+response_cache = ResponseCache(TTLCache(
+    max_entries=settings.POLADS_CACHE_MAX_ENTRIES,
+    max_bytes=settings.POLADS_CACHE_MAX_BYTES,
+))
+
+# Responses of routes that never change once an ad is archived, such as
+# getaddetails. They have no TTL and are bounded by size in bytes only.
+immutable_cache = TTLCache(
+    max_entries=None,
+    max_bytes=settings.POLADS_IMMUTABLE_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from polads.metrics import metrics
+from polads.recording import RECORD, REPLAY, Recording
+
+
+class PoladsClient:
+    """Keep-alive HTTP client for the Polads (ad-screener) API.
+
+    A single ``requests.Session`` is shared by every thread of a worker so
+    that upstream connections are pooled and reused instead of paying a
+    TCP+TLS handshake per proxied request.
+
+    In ``record`` mode upstream responses are also written to ``recording``;
+    in ``replay`` mode they are answered from it without any network access,
+    after their recorded latency times ``latency_scale``.
+    """
+
+    def __init__(self, base_url=None, token=None, pool_connections=None,
+                 pool_maxsize=None, pool_block=None, connect_timeout=None,
+                 read_timeout=None, route_timeouts=None, mode=None,
+                 recording=None, latency_scale=None):
+        self.base_url = base_url or settings.POLADS_BASE_API_URL
+        self.token = token if token is not None else settings.POLADS_API_TOKEN
+        self.pool_maxsize = pool_maxsize or settings.POLADS_POOL_MAXSIZE
+        self.connect_timeout = connect_timeout or settings.POLADS_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or settings.POLADS_READ_TIMEOUT
+        self.route_timeouts = (
+            route_timeouts if route_timeouts is not None
+            else settings.POLADS_ROUTE_TIMEOUTS
+        )
+
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections or settings.POLADS_POOL_CONNECTIONS,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=(
+                pool_block if pool_block is not None
+                else settings.POLADS_POOL_BLOCK
+            ),
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers['Authorization'] = self.token
+
+        self.mode = mode if mode is not None else settings.POLADS_RECORD_MODE
+        if self.mode not in ('', RECORD, REPLAY):
+            raise ImproperlyConfigured(f"Unknown POLADS_RECORD_MODE {self.mode!r}")
+        self.recording = None
+        if self.mode:
+            self.recording = recording or Recording(settings.POLADS_RECORDING)
+        self.latency_scale = (
+            latency_scale if latency_scale is not None
+            else settings.POLADS_REPLAY_LATENCY_SCALE
+        )
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._requests = 0
+        self._errors = 0
+
+    def timeout_for(self, route):
+        """Return the ``(connect, read)`` timeout tuple for a route template."""
+        connect, read = self.route_timeouts.get(
+            route, (self.connect_timeout, self.read_timeout)
+        )
+        return connect, read
+
+    def get(self, path, params=None, route=None, headers=None, stream=False):
+        with self._lock:
+            self._in_flight += 1
+            self._requests += 1
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            if self.mode == REPLAY:
+                response = self.recording.replay(path, params, self.latency_scale)
+            else:
+                response = self.session.get(
+                    f"{self.base_url}{path}",
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout_for(route),
+                    stream=stream,
+                )
+                if self.mode == RECORD:
+                    self.recording.save(path, params, response, time.perf_counter() - started)
+            status = response.status_code
+            return response
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            # Streamed responses are timed up to their headers
+            metrics.observe(
+                'polads_upstream_duration_seconds',
+                time.perf_counter() - started,
+                route=route or 'unknown',
+                status=status,
+            )
+
+    def stats(self):
+        """Snapshot of request counters and per-host pool occupancy."""
+        pools = []
+        poolmanager = self.adapter.poolmanager
+        for key in list(poolmanager.pools.keys()):
+            pool = poolmanager.pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            pools.append({
+                'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                'maxsize': pool.pool.maxsize,
+                'in_use': pool.pool.maxsize - pool.pool.qsize(),
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+            })
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'requests': self._requests,
+                'errors': self._errors,
+                'pools': pools,
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the pooled client of the current worker process.
+
+    The client is rebuilt after a fork so that worker processes never share
+    sockets inherited from their parent.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = PoladsClient()
+                _client_pid = pid
+    return _client
+
+
+_executor = None
+_executor_pid = None
+
+
+def get_executor():
+    """Return the thread pool used to fan out concurrent upstream requests."""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _client_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.POLADS_FANOUT_WORKERS,
+                    thread_name_prefix='polads-fanout'
+                )
+                _executor_pid = pid
+    return _executor
@@ -0,0 +1,92 @@
+import json
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+
+from polads.client import get_client
+from polads.search import AdSearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Add ads to the local full-text index used by the getads route.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', dest='file', default=None,
+            help='Read ads from a JSON array or JSON lines file instead of Polads.',
+        )
+        parser.add_argument(
+            '--param', dest='params', action='append', default=[],
+            help='getads query parameter as name=value, e.g. --param region=US.',
+        )
+        parser.add_argument(
+            '--page-size', dest='page_size', type=int, default=500,
+            help='Number of ads requested from Polads at a time.',
+        )
+        parser.add_argument(
+            '--max-ads', dest='max_ads', type=int, default=None,
+            help='Stop after this many ads.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.POLADS_AD_SEARCH_INDEX:
+            raise CommandError("POLADS_AD_SEARCH_INDEX is not set.")
+        index = AdSearchIndex(settings.POLADS_AD_SEARCH_INDEX)
+        index.create()
+        # Web workers use the index again once this run completes
+        index.start_ingest()
+
+        started = time.monotonic()
+        indexed = 0
+        batches = self.read_file(options['file']) if options['file'] else self.fetch(options)
+        for ads in batches:
+            if options['max_ads'] is not None:
+                ads = ads[:options['max_ads'] - indexed]
+            indexed += index.add(ads)
+            if options['max_ads'] is not None and indexed >= options['max_ads']:
+                break
+        index.finish_ingest()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Indexed {indexed} ads in {elapsed:.2f}s.")
+
+    def read_file(self, path, batch_size=1000):
+        with open(path) as f:
+            if f.read(1) == '[':
+                f.seek(0)
+                ads = json.load(f)
+                for start in range(0, len(ads), batch_size):
+                    yield ads[start:start + batch_size]
+                return
+            f.seek(0)
+            batch = []
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def fetch(self, options):
+        params = dict(param.split('=', 1) for param in options['params'])
+        offset = 0
+        while True:
+            try:
+                response = get_client().get(
+                    '/getads',
+                    params=dict(params, limit=options['page_size'], offset=offset),
+                    route='getads'
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise CommandError(f"Fetching ads at offset {offset} failed: {e}")
+            ads = response.json()
+            if not ads:
+                return
+            yield ads
+            offset += len(ads)
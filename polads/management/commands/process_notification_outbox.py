@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polads.notifications import process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Write queued notification subscription changes to Polads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int,
+            default=settings.POLADS_OUTBOX_BATCH_SIZE,
+            help='Number of outbox entries sent per batch.',
+        )
+        parser.add_argument(
+            '--every', dest='every', type=int, default=None,
+            help='Keep running and process the outbox every N seconds.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before sleeping
+            while True:
+                sent, failed = process_outbox(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} notification changes, {failed} failed.")
+                if sent + failed < options['batch_size']:
+                    break
+            if not options['every']:
+                return
+            time.sleep(options['every'])
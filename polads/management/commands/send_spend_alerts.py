@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polads.alerts import run_alerts
+
+
+class Command(BaseCommand):
+    help = 'Email subscribers a digest of material spend changes on what they follow.'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        keys, changed, sent = run_alerts()
+        self.stdout.write(
+            f"Checked {keys} keys, {changed} changed, sent {sent} digests "
+            f"in {time.monotonic() - started:.2f}s."
+        )
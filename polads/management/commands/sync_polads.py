@@ -0,0 +1,38 @@
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+
+from polads.replica import sync_region
+
+
+class Command(BaseCommand):
+    help = 'Incrementally sync Polads spend data into the local replica.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'regions', nargs='*',
+            help='Regions to sync, defaults to POLADS_REPLICA_REGIONS.',
+        )
+        parser.add_argument(
+            '--max-pages', dest='max_pages', type=int,
+            default=settings.POLADS_REPLICA_MAX_PAGES,
+            help='Number of top spending pages of each region to sync.',
+        )
+        parser.add_argument(
+            '--overlap-days', dest='overlap_days', type=int, default=7,
+            help='Days before the last watermark to request again.',
+        )
+
+    def handle(self, *args, **options):
+        for region_name in options['regions'] or settings.POLADS_REPLICA_REGIONS:
+            started = time.monotonic()
+            try:
+                series = sync_region(region_name, options['max_pages'], options['overlap_days'])
+            except requests.exceptions.RequestException as e:
+                raise CommandError(f"Syncing {region_name} failed: {e}")
+            self.stdout.write(
+                f"Synced {series} series of {region_name} in {time.monotonic() - started:.2f}s."
+            )
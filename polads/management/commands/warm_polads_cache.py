@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management import CommandError
+from django.http import QueryDict
+from django.urls import Resolver404, resolve
+
+from polads.api.v1.views import ProxyPoladsView
+from polads.cache import shared_cache, ttl_for
+from polads.stats import hot_keys
+
+
+class Command(BaseCommand):
+    help = 'Pre-fetch hot Polads routes into the shared proxy cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Polads paths to warm besides POLADS_WARM_PATHS, e.g. /topics or "/getads?search=vote".',
+        )
+        parser.add_argument(
+            '--top', dest='top', type=int, default=50,
+            help='Also warm the N most requested paths recorded by the proxy.',
+        )
+        parser.add_argument(
+            '--concurrency', dest='concurrency', type=int, default=4,
+            help='Maximum number of concurrent upstream requests.',
+        )
+        parser.add_argument(
+            '--every', dest='every', type=int, default=None,
+            help='Keep running and warm again every N seconds.',
+        )
+
+    def handle(self, *args, **options):
+        if shared_cache() is None:
+            raise CommandError(
+                "POLADS_CACHE_URL is not set: warmed entries would not reach the web workers."
+            )
+
+        while True:
+            self.warm(options['paths'], options['top'], options['concurrency'])
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    def warm(self, paths, top, concurrency):
+        paths = [*settings.POLADS_WARM_PATHS, *paths]
+        paths += [path for route, path, hits in hot_keys.top(top)]
+        # Each path once, in order
+        paths = list(dict.fromkeys(paths))
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(self.warm_path, paths))
+
+        self.stdout.write(
+            f"Warmed {results.count(True)} of {len(paths)} paths "
+            f"in {time.monotonic() - started:.2f}s."
+        )
+
+    def warm_path(self, path):
+        url = urlsplit(path)
+        polads_path = f"/{url.path.lstrip('/')}"
+        try:
+            match = resolve(polads_path, urlconf='polads.api.v1.urls')
+        except Resolver404:
+            self.stderr.write(f"{path}: not a Polads route")
+            return False
+        if getattr(match.func, 'view_class', None) is not ProxyPoladsView or not ttl_for(match.route):
+            self.stderr.write(f"{path}: route is not cacheable")
+            return False
+
+        try:
+            result = ProxyPoladsView()._fetch(
+                polads_path,
+                QueryDict(url.query),
+                match.route,
+                refresh=True
+            )
+        except requests.exceptions.RequestException as e:
+            self.stderr.write(f"{path}: {e}")
+            return False
+        if result.status_code != 200:
+            self.stderr.write(f"{path}: upstream returned {result.status_code}")
+            return False
+        return True
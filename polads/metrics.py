@@ -0,0 +1,136 @@
+import logging
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, the +Inf bucket is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds':
+        'Time spent answering a request, by route template, method and status.',
+    'polads_upstream_duration_seconds':
+        'Time spent waiting on the Polads API, by route template and status.',
+    'polads_json_duration_seconds':
+        'Time spent decoding Polads and encoding API JSON, by route template and stage.',
+}
+COUNTERS = {
+    'polads_cache_requests_total':
+        'Response cache lookups, by route template and result (hit, miss or stale).',
+    'auth_token_cache_requests_total':
+        'API token lookups, by result (local_hit, shared_hit or miss).',
+}
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+
+
+def _key(name, labels):
+    # Values are kept as strings so that e.g. status 200 and 'error' sort together
+    return (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+
+class Metrics:
+    """Histograms and counters of this worker, shared by all its threads.
+
+    Label values must come from a small set, such as route templates of the
+    URL patterns, never from raw paths.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        position = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.counts[position] += 1
+            histogram.sum += seconds
+
+    def increment(self, name, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def register(self, collector):
+        """Add gauges read at render time from ``collector()``.
+
+        The collector yields ``(name, help, labels, value)`` tuples.
+        """
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {
+                key: (list(histogram.counts), histogram.sum)
+                for key, histogram in self._histograms.items()
+            }
+            counters = dict(self._counters)
+            collectors = list(self._collectors)
+
+        lines = []
+        for name, help_text in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), (counts, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {total}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        for name, help_text in COUNTERS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        for collector in collectors:
+            try:
+                gauges = list(collector())
+            except Exception:
+                logger.exception("Collecting %s failed", collector.__name__)
+                continue
+            described = set()
+            for name, help_text, labels, value in gauges:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f'# HELP {name} {help_text}')
+                    lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
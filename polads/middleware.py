@@ -0,0 +1,25 @@
+import time
+
+from polads.metrics import metrics
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """Record the duration of every request by URL pattern route template."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe(
+            'http_request_duration_seconds',
+            time.perf_counter() - started,
+            route=match.route if match is not None else 'unmatched',
+            method=request.method if request.method in METHODS else 'other',
+            status=response.status_code,
+        )
+        return response
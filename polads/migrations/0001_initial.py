@@ -0,0 +1,65 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Page',
+            fields=[
+                ('page_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('page_name', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('watermark', models.DateField(null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Topic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SpendRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_period', models.DateField()),
+                ('spend', models.FloatField()),
+                ('page', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='spend_records', to='polads.Page')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_records', to='polads.Region')),
+                ('topic', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='spend_records', to='polads.Topic')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='spendrecord',
+            index=models.Index(fields=['region', 'page', 'time_period'], name='polads_spen_region__757cf5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spendrecord',
+            index=models.Index(fields=['region', 'topic', 'time_period'], name='polads_spen_region__9df856_idx'),
+        ),
+    ]
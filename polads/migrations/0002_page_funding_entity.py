@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='funding_entity',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polads', '0002_page_funding_entity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationSubscription',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(db_index=True, max_length=254)),
+                ('upstream_id', models.BigIntegerField(null=True, unique=True)),
+                ('page_id', models.BigIntegerField(null=True)),
+                ('region', models.CharField(blank=True, max_length=100)),
+                ('topic', models.CharField(blank=True, max_length=100)),
+                ('params', models.TextField(default='{}')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notification_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('add', 'Add'), ('remove', 'Remove')], max_length=10)),
+                ('upstream_id', models.BigIntegerField(null=True)),
+                ('params', models.TextField(default='{}')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(null=True)),
+                ('failed', models.BooleanField(default=False)),
+                ('subscription', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox', to='polads.NotificationSubscription')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notificationoutbox',
+            index=models.Index(fields=['sent_at', 'failed', 'next_attempt_at'], name='polads_noti_sent_at_5d524f_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polads', '0003_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_id', models.BigIntegerField(null=True)),
+                ('region', models.CharField(max_length=100)),
+                ('topic', models.CharField(blank=True, max_length=100)),
+                ('spend', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='spendsnapshot',
+            index=models.Index(fields=['region', 'page_id', 'topic'], name='polads_spen_region_c57a24_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def delete_duplicate_periods(apps, schema_editor):
+    # Overlapping syncs could insert a period twice, keep the latest record
+    SpendRecord = apps.get_model('polads', 'SpendRecord')
+    duplicates = (
+        SpendRecord.objects.values('region', 'page', 'topic', 'time_period')
+        .annotate(count=Count('id'), keep=Max('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        keep = duplicate.pop('keep')
+        duplicate.pop('count')
+        SpendRecord.objects.filter(**duplicate).exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polads', '0004_spendsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_periods, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='spendrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(topic__isnull=True), fields=('region', 'page', 'time_period'), name='polads_unique_page_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='spendrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(page__isnull=True), fields=('region', 'topic', 'time_period'), name='polads_unique_topic_period'),
+        ),
+    ]
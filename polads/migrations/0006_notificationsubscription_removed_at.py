@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polads', '0005_spendrecord_unique_period'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationsubscription',
+            name='removed_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -1,3 +1,149 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Region(models.Model):
+    name = models.SlugField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Topic(models.Model):
+    name = models.SlugField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Page(models.Model):
+    # Facebook page id as used by the Polads API
+    page_id = models.BigIntegerField(primary_key=True)
+    page_name = models.CharField(max_length=255, blank=True)
+    # Entity named in the "Paid for by" disclaimer of the page's ads
+    funding_entity = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.page_name or str(self.page_id)
+
+
+class SpendRecord(models.Model):
+    """Spend of a time period, for a page and/or a topic in a region.
+
+    Page series have no topic and topic series have no page.
+    """
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='spend_records')
+    page = models.ForeignKey(
+        Page, on_delete=models.CASCADE, related_name='spend_records', null=True
+    )
+    topic = models.ForeignKey(
+        Topic, on_delete=models.CASCADE, related_name='spend_records', null=True
+    )
+    time_period = models.DateField()
+    spend = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['region', 'page', 'time_period']),
+            models.Index(fields=['region', 'topic', 'time_period']),
+        ]
+        # One record per period of each series
+        constraints = [
+            models.UniqueConstraint(
+                fields=['region', 'page', 'time_period'],
+                condition=models.Q(topic__isnull=True),
+                name='polads_unique_page_period',
+            ),
+            models.UniqueConstraint(
+                fields=['region', 'topic', 'time_period'],
+                condition=models.Q(page__isnull=True),
+                name='polads_unique_topic_period',
+            ),
+        ]
+
+
+class SyncState(models.Model):
+    """Watermark of the last incremental sync of a Polads series."""
+    name = models.CharField(max_length=255, unique=True)
+    watermark = models.DateField(null=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class NotificationSubscription(models.Model):
+    """Spend alert a user subscribed to through the notifications routes.
+
+    ``params`` are the query parameters of the ``notifications/add`` call,
+    replayed as-is to Polads by the outbox.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notification_subscriptions',
+        null=True
+    )
+    email = models.EmailField(db_index=True)
+    # Id of the notification on Polads, once the outbox created it there
+    upstream_id = models.BigIntegerField(null=True, unique=True)
+    page_id = models.BigIntegerField(null=True)
+    region = models.CharField(max_length=100, blank=True)
+    topic = models.CharField(max_length=100, blank=True)
+    params = models.TextField(default='{}')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set on a removed subscription kept until the outbox removed it on Polads
+    removed_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"{self.email} ({self.pk})"
+
+
+class NotificationOutbox(models.Model):
+    """Subscription change waiting to be written to Polads."""
+    ADD = 'add'
+    REMOVE = 'remove'
+    ACTION_CHOICES = (
+        (ADD, 'Add'),
+        (REMOVE, 'Remove'),
+    )
+
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    subscription = models.ForeignKey(
+        NotificationSubscription,
+        on_delete=models.SET_NULL,
+        related_name='outbox',
+        null=True
+    )
+    upstream_id = models.BigIntegerField(null=True)
+    params = models.TextField(default='{}')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'failed', 'next_attempt_at']),
+        ]
+
+
+class SpendSnapshot(models.Model):
+    """Spend of a subscribed page or topic when its subscribers were last alerted.
+
+    Page keys have no topic and topic keys have no page, like SpendRecord.
+    """
+    page_id = models.BigIntegerField(null=True)
+    region = models.CharField(max_length=100)
+    topic = models.CharField(max_length=100, blank=True)
+    spend = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['region', 'page_id', 'topic']),
+        ]
@@ -0,0 +1,279 @@
+"""Local store of notification subscriptions, synced to Polads by an outbox.
+
+Reads are served from ``NotificationSubscription``. Adds and removes are
+applied locally at once and queued in ``NotificationOutbox``; the
+``process_notification_outbox`` command writes them to Polads with retries.
+"""
+import json
+import logging
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from polads.client import get_client
+from polads.models import NotificationOutbox, NotificationSubscription, SyncState
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_ROUTES = (
+    'notifications/of_user/<slug:email>',
+    'notifications/add',
+    'notifications/remove/<int:notification_id>',
+)
+
+
+def serialize(subscription):
+    data = json.loads(subscription.params)
+    data.update({
+        'id': subscription.pk,
+        'email': subscription.email,
+    })
+    return data
+
+
+def import_subscriptions(email):
+    """Copy the Polads subscriptions of an email into the local store, once.
+
+    The sync is only marked done together with the insert, so a failed
+    import is tried again on the next list. Subscriptions the outbox already
+    created on Polads are known locally and not imported twice.
+    """
+    name = f'notifications:{email}'
+    if SyncState.objects.filter(name=name).exists():
+        return
+    response = get_client().get(
+        f'/notifications/of_user/{email}',
+        route='notifications/of_user/<slug:email>'
+    )
+    response.raise_for_status()
+    notifications = response.json()
+
+    with transaction.atomic():
+        state, created = SyncState.objects.get_or_create(name=name)
+        if not created:
+            return
+        known = set(
+            NotificationSubscription.objects.filter(
+                upstream_id__in=[notification.get('id') for notification in notifications]
+            ).values_list('upstream_id', flat=True)
+        )
+        user = get_user_model().objects.filter(email__iexact=email).first()
+        NotificationSubscription.objects.bulk_create([
+            NotificationSubscription(
+                user=user,
+                email=email,
+                upstream_id=notification.get('id'),
+                page_id=notification.get('page_id'),
+                region=notification.get('region') or '',
+                topic=notification.get('topic') or '',
+                params=json.dumps({
+                    key: value for key, value in notification.items() if key not in ('id', 'email')
+                }),
+            )
+            for notification in notifications
+            if notification.get('id') is None or notification.get('id') not in known
+        ])
+
+
+def list_subscriptions(email):
+    import_subscriptions(email)
+    return [
+        serialize(subscription)
+        for subscription in NotificationSubscription.objects.filter(
+            email=email, removed_at__isnull=True
+        ).order_by('pk')
+    ]
+
+
+@transaction.atomic
+def add_subscription(query_parameters):
+    params = query_parameters.dict()
+    email = params.get('email', '')
+    page_id = params.get('page_id')
+    subscription = NotificationSubscription.objects.create(
+        user=get_user_model().objects.filter(email__iexact=email).first() if email else None,
+        email=email,
+        page_id=int(page_id) if page_id and page_id.isdigit() else None,
+        region=params.get('region', ''),
+        topic=params.get('topic', ''),
+        params=json.dumps(params),
+    )
+    NotificationOutbox.objects.create(
+        action=NotificationOutbox.ADD,
+        subscription=subscription,
+        params=subscription.params,
+    )
+    return subscription
+
+
+@transaction.atomic
+def remove_subscription(notification_id):
+    """Delete a subscription locally and queue its removal on Polads.
+
+    An add that no worker has claimed yet is cancelled with the subscription.
+    Otherwise, while the Polads id is unknown, the subscription is kept as a
+    tombstone hidden from reads, and the queued remove looks the id up once
+    the add is done. Returns False if there is no such subscription.
+    """
+    subscription = NotificationSubscription.objects.filter(
+        pk=notification_id, removed_at__isnull=True
+    ).first()
+    if subscription is None:
+        return False
+    if subscription.upstream_id is not None:
+        NotificationOutbox.objects.create(
+            action=NotificationOutbox.REMOVE,
+            upstream_id=subscription.upstream_id,
+        )
+        subscription.delete()
+        return True
+
+    # A leased add has a future next_attempt_at and is left to its worker
+    cancelled, _ = subscription.outbox.filter(
+        action=NotificationOutbox.ADD,
+        sent_at__isnull=True,
+        attempts=0,
+        next_attempt_at__lte=timezone.now(),
+    ).delete()
+    if cancelled:
+        subscription.delete()
+        return True
+    subscription.removed_at = timezone.now()
+    subscription.save(update_fields=['removed_at'])
+    NotificationOutbox.objects.create(
+        action=NotificationOutbox.REMOVE,
+        subscription=subscription,
+    )
+    return True
+
+
+class AddPending(Exception):
+    """The add of a removed subscription has not been sent yet."""
+
+
+def _upstream_id(subscription):
+    """Polads id of a removed subscription, None if it does not exist there.
+
+    When Polads did not return an id for the add, the subscriptions of the
+    email are listed and the first one with the same parameters that no
+    other local subscription holds is taken.
+    """
+    if subscription is None:
+        return None
+    if subscription.upstream_id is not None:
+        return subscription.upstream_id
+    if subscription.outbox.filter(
+        action=NotificationOutbox.ADD, sent_at__isnull=True, failed=False
+    ).exists():
+        raise AddPending()
+
+    response = get_client().get(
+        f'/notifications/of_user/{subscription.email}',
+        route='notifications/of_user/<slug:email>'
+    )
+    response.raise_for_status()
+    params = json.loads(subscription.params)
+    params.pop('email', None)
+    taken = set(
+        NotificationSubscription.objects.filter(email=subscription.email, upstream_id__isnull=False)
+        .values_list('upstream_id', flat=True)
+    )
+    for notification in response.json():
+        if notification.get('id') in taken:
+            continue
+        if all(str(notification.get(key)) == str(value) for key, value in params.items()):
+            return notification.get('id')
+    return None
+
+
+def _send(entry):
+    """Write an entry to Polads; returns the Polads id of the subscription, if known."""
+    client = get_client()
+    if entry.action == NotificationOutbox.ADD:
+        response = client.get('/notifications/add', params=json.loads(entry.params), route='notifications/add')
+        response.raise_for_status()
+        body = response.json() if response.content else None
+        return body.get('id') if isinstance(body, dict) else None
+
+    upstream_id = entry.upstream_id
+    if upstream_id is None:
+        upstream_id = _upstream_id(entry.subscription)
+        if upstream_id is None:
+            return None
+    response = client.get(
+        f'/notifications/remove/{upstream_id}',
+        route='notifications/remove/<int:notification_id>'
+    )
+    response.raise_for_status()
+    return upstream_id
+
+
+def _claim(batch_size):
+    """Lease a batch of due entries so that other workers skip them meanwhile.
+
+    Rows are only locked while leasing; an entry whose worker died before
+    recording the outcome is due again once POLADS_OUTBOX_LEASE has passed.
+    """
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(sent_at__isnull=True, failed=False, next_attempt_at__lte=timezone.now())
+            .order_by('created_at')[:batch_size]
+        )
+        NotificationOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.POLADS_OUTBOX_LEASE)
+        )
+    return entries
+
+
+def process_outbox(batch_size):
+    """Write one batch of due outbox entries to Polads, oldest first.
+
+    The outcome of each entry is committed as soon as it is sent, so a
+    failure later in the batch never causes a delivered entry to be sent
+    again. The remove of a subscription whose add is still queued waits
+    for it without counting an attempt. Failed entries are retried with exponential backoff until
+    POLADS_OUTBOX_MAX_ATTEMPTS. Returns ``(sent, failed)`` counts.
+    """
+    sent = failed = 0
+    for entry in _claim(batch_size):
+        try:
+            upstream_id = _send(entry)
+        except AddPending:
+            entry.next_attempt_at = timezone.now() + timedelta(seconds=settings.POLADS_OUTBOX_RETRY_DELAY)
+            entry.save(update_fields=['next_attempt_at'])
+            continue
+        except Exception as e:
+            if not isinstance(e, (requests.exceptions.RequestException, ValueError)):
+                logger.exception("Sending notification outbox entry %s failed", entry.pk)
+            entry.attempts += 1
+            entry.last_error = str(e)
+            entry.failed = entry.attempts >= settings.POLADS_OUTBOX_MAX_ATTEMPTS
+            entry.next_attempt_at = timezone.now() + timedelta(
+                seconds=min(settings.POLADS_OUTBOX_RETRY_DELAY * 2 ** (entry.attempts - 1),
+                            settings.POLADS_OUTBOX_MAX_RETRY_DELAY)
+            )
+            entry.save(update_fields=['attempts', 'last_error', 'failed', 'next_attempt_at'])
+            failed += 1
+            continue
+
+        with transaction.atomic():
+            if entry.action == NotificationOutbox.ADD:
+                if entry.subscription_id and upstream_id is not None:
+                    NotificationSubscription.objects.filter(pk=entry.subscription_id).update(
+                        upstream_id=upstream_id
+                    )
+            else:
+                entry.upstream_id = upstream_id
+                if entry.subscription_id:
+                    # The tombstone has served its purpose
+                    NotificationSubscription.objects.filter(pk=entry.subscription_id).delete()
+                    entry.subscription = None
+            entry.sent_at = timezone.now()
+            entry.save(update_fields=['sent_at', 'upstream_id', 'subscription'])
+        sent += 1
+    return sent, failed
@@ -0,0 +1,113 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from polads.cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    key TEXT PRIMARY KEY,
+    status_code INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    elapsed REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+# Response headers worth replaying; requests already decoded the body, so
+# encoding and length headers would be wrong
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+
+class Recording:
+    """Upstream responses stored in a SQLite file, bodies zlib-compressed.
+
+    Exchanges are keyed by path and sorted query string; recording a request
+    again replaces the previous exchange. Every thread has its own
+    connection and WAL journaling lets them write concurrently.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM exchanges').fetchone()[0]
+
+    def save(self, path, params, response, elapsed):
+        """Store a response; streamed bodies are read in full first.
+
+        A write that fails, e.g. on "database is locked" when threads write
+        at once, is logged and the exchange left unrecorded.
+        """
+        if response.status_code == 304:
+            # Only meaningful to the cache entry that was revalidated
+            return
+        headers = {
+            header: response.headers[header]
+            for header in RECORDED_HEADERS if header in response.headers
+        }
+        key = cache_key(path, params)
+        try:
+            with self.connection as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO exchanges VALUES (?, ?, ?, ?, ?, ?)',
+                    (
+                        key,
+                        response.status_code,
+                        json.dumps(headers),
+                        zlib.compress(response.content),
+                        elapsed,
+                        time.time(),
+                    )
+                )
+        except sqlite3.OperationalError as e:
+            logger.warning("Recording %s failed: %s", key, e)
+
+    def replay(self, path, params, latency_scale=1.0):
+        """The recorded response, after its recorded latency times ``latency_scale``.
+
+        Raises ConnectionError for requests that were never recorded, which
+        the proxy reports like an unreachable Polads API.
+        """
+        key = cache_key(path, params)
+        row = self.connection.execute(
+            'SELECT status_code, headers, body, elapsed FROM exchanges WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            raise requests.exceptions.ConnectionError(f"No recorded response for {key}")
+        status_code, headers, body, elapsed = row
+        if latency_scale:
+            time.sleep(elapsed * latency_scale)
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.url = key
+        response.encoding = 'utf-8'
+        # A consumed body still supports iter_content(), for streamed routes
+        response._content = zlib.decompress(body)
+        response._content_consumed = True
+        return response
@@ -0,0 +1,97 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from polads.cache import CachedResponse, validators
+from polads.client import get_client, get_executor
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_ROUTES = (
+    'topics',
+    'races',
+    'race/<int:race_id>/candidates',
+)
+
+
+def race_ids(races):
+    """Ids of a ``races`` payload: a list of races, possibly under "races"."""
+    if isinstance(races, dict):
+        races = races.get('races', [])
+    ids = []
+    for race in races:
+        if isinstance(race, dict):
+            race_id = race.get('race_id', race.get('id'))
+            if race_id is not None:
+                ids.append(race_id)
+    return ids
+
+
+class ReferenceData:
+    """Topics, races and race candidates kept in process memory.
+
+    A background thread refreshes them on a jittered timer, so that workers
+    started together do not refresh together. Requests only ever read the
+    current snapshot and never wait on Polads; paths that are not loaded yet
+    return None.
+    """
+
+    def __init__(self):
+        self._responses = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        return self._responses.get(path)
+
+    def _load(self, path, route):
+        try:
+            response = get_client().get(path, route=route)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            logger.warning("Refreshing %s failed, keeping the loaded copy", path, exc_info=True)
+            return self._responses.get(path)
+        etag, last_modified = validators(response)
+        return CachedResponse(response.status_code, response.json(), etag, last_modified)
+
+    def refresh(self):
+        responses = {
+            '/topics': self._load('/topics', 'topics'),
+            '/races': self._load('/races', 'races'),
+        }
+        if responses['/races'] is not None:
+            paths = [f'/race/{race_id}/candidates' for race_id in race_ids(responses['/races'].data)]
+            candidates = get_executor().map(
+                lambda path: self._load(path, 'race/<int:race_id>/candidates'), paths
+            )
+            responses.update(zip(paths, candidates))
+        # Replace the snapshot in one assignment, readers see old or new
+        self._responses = {path: response for path, response in responses.items() if response}
+        return len(self._responses)
+
+    def start(self, interval, jitter=0.1):
+        """Load in the background now and then about every ``interval`` seconds."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._refresh_forever,
+                args=(interval, jitter),
+                name='polads-reference-data',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _refresh_forever(self, interval, jitter):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing reference data failed")
+            time.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+
+
+reference_data = ReferenceData()
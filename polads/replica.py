@@ -0,0 +1,262 @@
+"""Local replica of Polads spend data.
+
+``sync_region`` reads, and ``local_response`` renders, these upstream shapes:
+
+    total_spend/by_page/of_region/<region_name>
+        {"region_name": ...,
+         "spenders": [{"page_id": 1, "page_name": ..., "funding_entity": ..., "spend": 1.0}]}
+    total_spend/by_topic/of_region/<region_name>
+        {"region_name": ..., "spend_by_topic": [{"topic_name": ..., "spend": 1.0}]}
+    spend_by_time_period/of_page/<page_id>/of_region/<region_name>
+    spend_by_time_period/of_topic/<topic_name>/of_region/<region_name>
+        {"spend_in_timeperiod": [{"time_period": "2020-07-12", "spend": 1.0}]}
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from polads.client import get_client, get_executor
+from polads.models import Page, Region, SpendRecord, SyncState, Topic
+
+
+def _get_json(path, params=None):
+    response = get_client().get(path, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def upsert_pages(spenders):
+    """Bulk insert or rename pages of a ``spenders`` list."""
+    names = {
+        int(spender['page_id']): (
+            spender.get('page_name') or '',
+            spender.get('funding_entity') or '',
+        )
+        for spender in spenders
+    }
+    existing = Page.objects.in_bulk(list(names))
+    renamed = []
+    for page_id, page in existing.items():
+        if (page.page_name, page.funding_entity) != names[page_id]:
+            page.page_name, page.funding_entity = names[page_id]
+            renamed.append(page)
+    Page.objects.bulk_update(renamed, ['page_name', 'funding_entity'])
+    Page.objects.bulk_create([
+        Page(page_id=page_id, page_name=name, funding_entity=funding_entity)
+        for page_id, (name, funding_entity) in names.items()
+        if page_id not in existing
+    ])
+
+
+def upsert_series(region, series, page=None, topic=None):
+    """Bulk insert or update the spend records of one time series.
+
+    Returns the latest time period of the series, or None if it is empty.
+    """
+    spend = {
+        parse_date(point['time_period']): float(point['spend'])
+        for point in series
+    }
+    spend.pop(None, None)
+    if not spend:
+        return None
+
+    existing = list(SpendRecord.objects.filter(
+        region=region, page=page, topic=topic, time_period__in=list(spend)
+    ))
+    changed = []
+    for record in existing:
+        if record.spend != spend[record.time_period]:
+            record.spend = spend[record.time_period]
+            changed.append(record)
+    known = {record.time_period for record in existing}
+    SpendRecord.objects.bulk_update(changed, ['spend'])
+    # A concurrent sync may have inserted the same periods meanwhile
+    SpendRecord.objects.bulk_create([
+        SpendRecord(region=region, page=page, topic=topic, time_period=period, spend=amount)
+        for period, amount in spend.items()
+        if period not in known
+    ], ignore_conflicts=True)
+    return max(spend)
+
+
+def series_state_name(region_name, page_id=None, topic_name=None):
+    """SyncState name holding the watermark of one page or topic series."""
+    if page_id is not None:
+        return f'series:{region_name}:page:{page_id}'
+    return f'series:{region_name}:topic:{topic_name}'
+
+
+def sync_region(region_name, max_pages, overlap_days=7):
+    """Pull spend of the top pages and of every topic of a region.
+
+    Each series is requested from its own watermark (minus ``overlap_days``
+    to pick up late corrections), so a page that newly enters the top list
+    gets its whole history. Returns the number of series synced.
+    """
+    region, _ = Region.objects.get_or_create(name=region_name)
+    states = {
+        state.name: state
+        for state in SyncState.objects.filter(name__startswith=f'series:{region_name}:')
+    }
+
+    def params_of(name):
+        state = states.get(name)
+        if state is None or state.watermark is None:
+            return {}
+        return {'start_date': (state.watermark - timedelta(days=overlap_days)).isoformat()}
+
+    spenders = _get_json(f'/total_spend/by_page/of_region/{region_name}')['spenders'][:max_pages]
+    topic_names = [
+        topic['topic_name']
+        for topic in _get_json(f'/total_spend/by_topic/of_region/{region_name}')['spend_by_topic']
+    ]
+    upsert_pages(spenders)
+    for name in topic_names:
+        Topic.objects.get_or_create(name=name)
+
+    page_series = get_executor().map(
+        lambda spender: _get_json(
+            f"/spend_by_time_period/of_page/{spender['page_id']}/of_region/{region_name}",
+            params_of(series_state_name(region_name, page_id=int(spender['page_id'])))
+        ),
+        spenders
+    )
+    topic_series = get_executor().map(
+        lambda name: _get_json(
+            f'/spend_by_time_period/of_topic/{name}/of_region/{region_name}',
+            params_of(series_state_name(region_name, topic_name=name))
+        ),
+        topic_names
+    )
+
+    watermarks = {}
+    with transaction.atomic():
+        pages = Page.objects.in_bulk([int(spender['page_id']) for spender in spenders])
+        for spender, data in zip(spenders, page_series):
+            page = pages[int(spender['page_id'])]
+            watermarks[series_state_name(region_name, page_id=page.page_id)] = upsert_series(
+                region, data['spend_in_timeperiod'], page=page
+            )
+        topics = {topic.name: topic for topic in Topic.objects.filter(name__in=topic_names)}
+        for name, data in zip(topic_names, topic_series):
+            watermarks[series_state_name(region_name, topic_name=name)] = upsert_series(
+                region, data['spend_in_timeperiod'], topic=topics[name]
+            )
+
+        now = timezone.now()
+        updated = []
+        for name, latest in watermarks.items():
+            state = states.get(name)
+            if state is not None and latest is not None and (state.watermark is None or latest > state.watermark):
+                state.watermark = latest
+                state.synced_at = now
+                updated.append(state)
+        SyncState.objects.bulk_update(updated, ['watermark', 'synced_at'])
+        SyncState.objects.bulk_create([
+            SyncState(name=name, watermark=latest)
+            for name, latest in watermarks.items()
+            if name not in states and latest is not None
+        ])
+    return len(spenders) + len(topic_names)
+
+
+def _series(records):
+    return {
+        'spend_in_timeperiod': [
+            {'time_period': period.isoformat(), 'spend': spend}
+            for period, spend in records.order_by('time_period').values_list('time_period', 'spend')
+        ]
+    }
+
+
+def _total_spend_by_page(records, region_name):
+    spenders = (
+        records.filter(page__isnull=False)
+        .values('page_id', 'page__page_name')
+        .annotate(spend=Sum('spend'))
+        .order_by('-spend')
+    )
+    if not spenders:
+        return None
+    return {
+        'region_name': region_name,
+        'spenders': [
+            {'page_id': row['page_id'], 'page_name': row['page__page_name'], 'spend': row['spend']}
+            for row in spenders
+        ],
+    }
+
+
+def _total_spend_by_topic(records, region_name):
+    topics = (
+        records.filter(topic__isnull=False)
+        .values('topic__name')
+        .annotate(spend=Sum('spend'))
+        .order_by('-spend')
+    )
+    if not topics:
+        return None
+    return {
+        'region_name': region_name,
+        'spend_by_topic': [
+            {'topic_name': row['topic__name'], 'spend': row['spend']}
+            for row in topics
+        ],
+    }
+
+
+def _total_spend_of_page(records, region_name, page_id):
+    spend = records.filter(page_id=page_id).aggregate(spend=Sum('spend'))['spend']
+    if spend is None:
+        return None
+    return {'page_id': page_id, 'region_name': region_name, 'spend': spend}
+
+
+def _spend_of_page(records, region_name, page_id):
+    records = records.filter(page_id=page_id)
+    return _series(records) if records.exists() else None
+
+
+def _spend_of_topic(records, region_name, topic_name):
+    records = records.filter(topic__name=topic_name)
+    return _series(records) if records.exists() else None
+
+
+LOCAL_ROUTES = {
+    'total_spend/by_page/of_region/<slug:region_name>': _total_spend_by_page,
+    'total_spend/by_topic/of_region/<slug:region_name>': _total_spend_by_topic,
+    'total_spend/of_page/<int:page_id>/of_region/<slug:region_name>': _total_spend_of_page,
+    'spend_by_time_period/of_page/<int:page_id>/of_region/<slug:region_name>': _spend_of_page,
+    'spend_by_time_period/of_topic/<slug:topic_name>/of_region/<slug:region_name>': _spend_of_topic,
+}
+
+
+def local_response(route, kwargs, query_parameters):
+    """Answer a spend route from the replica, or None to fall back to Polads.
+
+    Only the ``start_date`` and ``end_date`` filters are supported locally.
+    """
+    if route not in LOCAL_ROUTES or set(query_parameters) - {'start_date', 'end_date'}:
+        return None
+    region = Region.objects.filter(name=kwargs['region_name']).first()
+    if region is None:
+        return None
+
+    records = SpendRecord.objects.filter(region=region)
+    for name, lookup in (('start_date', 'time_period__gte'), ('end_date', 'time_period__lte')):
+        if name in query_parameters:
+            try:
+                date = parse_date(query_parameters[name])
+            except ValueError:
+                date = None
+            if date is None:
+                return None
+            records = records.filter(**{lookup: date})
+
+    kwargs = dict(kwargs)
+    region_name = kwargs.pop('region_name')
+    return LOCAL_ROUTES[route](records, region_name, **kwargs)
@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+class InvalidSearch(ValueError):
+    """Paging parameters of a search are not valid."""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ads (
+    ad_cluster_id INTEGER PRIMARY KEY,
+    archive_id INTEGER,
+    page_id INTEGER,
+    page_name TEXT NOT NULL DEFAULT '',
+    funding_entity TEXT NOT NULL DEFAULT '',
+    ad_creative_body TEXT NOT NULL DEFAULT '',
+    region TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ads_page_id ON ads (page_id, start_date);
+CREATE INDEX IF NOT EXISTS ads_region ON ads (region, start_date);
+CREATE INDEX IF NOT EXISTS ads_start_date ON ads (start_date);
+CREATE TABLE IF NOT EXISTS ad_topics (
+    topic TEXT NOT NULL,
+    ad_cluster_id INTEGER NOT NULL,
+    PRIMARY KEY (topic, ad_cluster_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS ads_fts USING fts5(
+    ad_creative_body, funding_entity, page_name,
+    content='ads', content_rowid='ad_cluster_id'
+);
+CREATE TRIGGER IF NOT EXISTS ads_ai AFTER INSERT ON ads BEGIN
+    INSERT INTO ads_fts (rowid, ad_creative_body, funding_entity, page_name)
+    VALUES (new.ad_cluster_id, new.ad_creative_body, new.funding_entity, new.page_name);
+END;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS ads_ad AFTER DELETE ON ads BEGIN
+    INSERT INTO ads_fts (ads_fts, rowid, ad_creative_body, funding_entity, page_name)
+    VALUES ('delete', old.ad_cluster_id, old.ad_creative_body, old.funding_entity, old.page_name);
+END;
+"""
+
+# bm25() weights of ad_creative_body, funding_entity and page_name
+BM25_WEIGHTS = (1.0, 2.0, 2.0)
+
+FILTERS = {
+    'page_id': 'ads.page_id = ?',
+    'region': 'ads.region = ?',
+    'funding_entity': 'ads.funding_entity = ?',
+    'start_date': 'ads.end_date >= ?',
+    'end_date': 'ads.start_date <= ?',
+    'topic': 'ads.ad_cluster_id IN (SELECT ad_cluster_id FROM ad_topics WHERE topic = ?)',
+}
+SEARCH_PARAMETERS = set(FILTERS) | {'search', 'limit', 'offset'}
+
+
+class AdSearchIndex:
+    """Full-text index of ad creatives in its own SQLite (FTS5) database.
+
+    The file is written by the ``index_polads_ads`` command and read by the
+    web workers, each thread with its own connection. WAL journaling lets
+    both happen at the same time. Searches are only answered once an ingest
+    ran to completion, so an interrupted one never passes for the full index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+        return connection
+
+    def create(self):
+        """Create the tables, once per file; WAL journaling is kept in the file."""
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def start_ingest(self):
+        """Mark the index incomplete, searches go to Polads until ``finish_ingest``."""
+        with self.connection as connection:
+            connection.execute("DELETE FROM meta WHERE name = 'complete_at'")
+
+    def finish_ingest(self):
+        with self.connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('complete_at', ?)", (timezone.now().isoformat(),)
+            )
+
+    def is_ready(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            return self.connection.execute(
+                "SELECT 1 FROM meta WHERE name = 'complete_at'"
+            ).fetchone() is not None
+        except sqlite3.OperationalError:
+            # Not created yet
+            return False
+
+    def add(self, ads):
+        """Insert or replace ads given as decoded ``getads`` items."""
+        rows = []
+        topics = []
+        for ad in ads:
+            ad_cluster_id = int(ad['ad_cluster_id'])
+            rows.append((
+                ad_cluster_id,
+                ad.get('archive_id') or ad.get('canonical_archive_id'),
+                ad.get('page_id'),
+                ad.get('page_name') or '',
+                ad.get('funding_entity') or '',
+                ad.get('ad_creative_body') or '',
+                ad.get('region'),
+                ad.get('start_date') or ad.get('min_ad_creation_time'),
+                ad.get('end_date') or ad.get('max_last_active_date'),
+                json.dumps(ad, separators=(',', ':')),
+            ))
+            topics.extend((topic, ad_cluster_id) for topic in ad.get('topics') or [])
+
+        with self.connection as connection:
+            # Deleting first fires the trigger that removes stale FTS entries
+            connection.executemany(
+                'DELETE FROM ads WHERE ad_cluster_id = ?', [(row[0],) for row in rows]
+            )
+            connection.executemany(
+                'DELETE FROM ad_topics WHERE ad_cluster_id = ?', [(row[0],) for row in rows]
+            )
+            connection.executemany(
+                'INSERT INTO ads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+            connection.executemany(
+                'INSERT OR IGNORE INTO ad_topics VALUES (?, ?)', topics
+            )
+        return len(rows)
+
+    def search(self, query_parameters):
+        """JSON array of matching ads, or None if the query needs Polads.
+
+        Queries with parameters the index does not know are left to Polads,
+        as are invalid dates. Paging values that are not integers, or a
+        negative offset, raise InvalidSearch; the limit is clamped to
+        1..POLADS_AD_SEARCH_MAX_LIMIT, as SQLite reads a negative one as no limit.
+        """
+        if set(query_parameters) - SEARCH_PARAMETERS:
+            return None
+        try:
+            limit = int(query_parameters.get('limit', 20))
+            offset = int(query_parameters.get('offset', 0))
+        except ValueError:
+            raise InvalidSearch("limit and offset must be integers.")
+        if offset < 0:
+            raise InvalidSearch("offset must not be negative.")
+        limit = max(1, min(limit, settings.POLADS_AD_SEARCH_MAX_LIMIT))
+
+        clauses = []
+        arguments = []
+        for name, clause in FILTERS.items():
+            if name not in query_parameters:
+                continue
+            value = query_parameters[name]
+            if name in ('start_date', 'end_date'):
+                try:
+                    if parse_date(value) is None:
+                        return None
+                except ValueError:
+                    return None
+            clauses.append(clause)
+            arguments.append(value)
+
+        search = query_parameters.get('search', '').strip()
+        if search:
+            # Quote every term so that user input is never FTS5 syntax
+            terms = ' '.join('"%s"' % term.replace('"', '""') for term in search.split())
+            sql = (
+                'SELECT ads.data FROM ads_fts JOIN ads ON ads.ad_cluster_id = ads_fts.rowid '
+                'WHERE ads_fts MATCH ?'
+            )
+            arguments.insert(0, terms)
+            order = 'bm25(ads_fts, %s, %s, %s)' % BM25_WEIGHTS
+        else:
+            sql = 'SELECT ads.data FROM ads WHERE 1 = 1'
+            order = 'ads.start_date DESC'
+        for clause in clauses:
+            sql += f' AND {clause}'
+        sql += f' ORDER BY {order} LIMIT ? OFFSET ?'
+
+        rows = self.connection.execute(sql, arguments + [limit, offset]).fetchall()
+        return '[%s]' % ','.join(row[0] for row in rows)
+
+
+ad_search_index = (
+    AdSearchIndex(settings.POLADS_AD_SEARCH_INDEX)
+    if settings.POLADS_AD_SEARCH_INDEX else None
+)
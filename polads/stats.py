@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from polads.cache import shared_cache
+
+
+class HotKeys:
+    """Hit counts per cacheable path, merged across workers in the shared cache.
+
+    Counts are buffered in process and added to the shared totals at most
+    every ``flush_interval`` seconds. Only the ``max_keys`` most requested
+    paths are kept.
+    """
+    cache_key = 'polads:hot_keys'
+
+    def __init__(self, flush_interval, max_keys, clock=time.monotonic):
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._routes = {}
+        self._next_flush = clock() + flush_interval
+
+    def record(self, route, path):
+        if shared_cache() is None:
+            return
+        with self._lock:
+            if path in self._counts or len(self._counts) < self.max_keys:
+                self._counts[path] += 1
+                self._routes[path] = route
+            due = self.clock() >= self._next_flush
+            if due:
+                self._next_flush = self.clock() + self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        shared = shared_cache()
+        with self._lock:
+            counts, routes = self._counts, self._routes
+            self._counts, self._routes = Counter(), {}
+        if shared is None or not counts:
+            return
+        # Concurrent flushes from other workers may lose a few counts, which
+        # is fine for picking hot keys.
+        totals = shared.get(self.cache_key) or {}
+        for path, hits in counts.items():
+            totals[path] = (routes[path], totals.get(path, (None, 0))[1] + hits)
+        if len(totals) > self.max_keys:
+            totals = dict(
+                sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:self.max_keys]
+            )
+        shared.set(self.cache_key, totals, timeout=None)
+
+    def top(self, limit):
+        """The most requested ``(route, path, hits)`` across all workers."""
+        shared = shared_cache()
+        totals = shared.get(self.cache_key) or {} if shared is not None else {}
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [(route, path, hits) for path, (route, hits) in ranked[:limit]]
+
+
+hot_keys = HotKeys(
+    flush_interval=settings.POLADS_HOT_KEYS_FLUSH_INTERVAL,
+    max_keys=settings.POLADS_HOT_KEYS_MAX,
+)
@@ -0,0 +1,12 @@
+import pytest
+
+from polads.cache import immutable_cache, response_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_response_caches():
+    response_cache.clear()
+    immutable_cache.clear()
+    yield
+    response_cache.clear()
+    immutable_cache.clear()
@@ -0,0 +1,89 @@
+from unittest import mock
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+
+from polads.alerts import run_alerts
+from polads.client import get_client
+from polads.models import NotificationSubscription, Page, SpendSnapshot
+from polads.tests.test_client import fake_response
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def direct_email(settings):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+def spend_of(amounts):
+    def get(path, params=None, route=None):
+        return fake_response(json={'spend_in_timeperiod': [
+            {'time_period': '2020-07-12', 'spend': amounts[path]},
+        ]})
+    return get
+
+
+def subscribe(email, **key):
+    NotificationSubscription.objects.create(email=email, **key)
+
+
+def test_each_key_is_fetched_once_and_digests_are_per_user():
+    Page.objects.create(page_id=7, page_name='Campaign')
+    subscribe('alice@example.com', page_id=7, region='ohio')
+    subscribe('alice@example.com', topic='health', region='ohio')
+    subscribe('bob@example.com', page_id=7, region='ohio', topic='health')
+    subscribe('carol@example.com', page_id=8)
+    page, topic, other = (
+        '/spend_by_time_period/of_page/7/of_region/ohio',
+        '/spend_by_time_period/of_topic/health/of_region/ohio',
+        '/spend_by_time_period/of_page/8/of_region/US',
+    )
+
+    with mock.patch.object(get_client(), 'get', side_effect=spend_of({page: 1000, topic: 500, other: 50})):
+        assert run_alerts() == (3, 0, 0)
+    assert SpendSnapshot.objects.count() == 3
+
+    amounts = {page: 2000, topic: 550, other: 400}
+    with mock.patch.object(get_client(), 'get', side_effect=spend_of(amounts)) as client_get:
+        call_command('send_spend_alerts')
+
+    assert client_get.call_count == 3
+    digests = {message.to[0]: message.body for message in mail.outbox}
+    # Topic +10% is not material, page 8 +$350 is
+    assert set(digests) == {'alice@example.com', 'bob@example.com', 'carol@example.com'}
+    assert '- Campaign in ohio: $1,000 -> $2,000 (+100%)' in digests['alice@example.com']
+    assert 'topic health' not in digests['alice@example.com']
+    assert 'page 8 in US' in digests['carol@example.com']
+    assert SpendSnapshot.objects.get(page_id=7).spend == 2000
+    # Compared with the spend last alerted on, so drift adds up
+    assert SpendSnapshot.objects.get(topic='health').spend == 500
+
+
+def test_snapshots_are_kept_when_sending_fails():
+    subscribe('alice@example.com', page_id=7, region='ohio')
+    SpendSnapshot.objects.create(page_id=7, region='ohio', spend=1000)
+    amounts = {'/spend_by_time_period/of_page/7/of_region/ohio': 2000}
+
+    with mock.patch.object(get_client(), 'get', side_effect=spend_of(amounts)), \
+            mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                       side_effect=ConnectionError('refused')):
+        with pytest.raises(ConnectionError):
+            run_alerts()
+    assert SpendSnapshot.objects.get().spend == 1000
+
+    with mock.patch.object(get_client(), 'get', side_effect=spend_of(amounts)):
+        assert run_alerts() == (1, 1, 1)
+    assert SpendSnapshot.objects.get().spend == 2000
+
+
+def test_failed_fetch_keeps_snapshot():
+    subscribe('alice@example.com', page_id=7, region='ohio')
+    SpendSnapshot.objects.create(page_id=7, region='ohio', spend=1000)
+    SpendSnapshot.objects.create(page_id=9, region='ohio', spend=1000)
+
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(status_code=502)):
+        assert run_alerts() == (1, 0, 0)
+    # Kept for the next run, while the unfollowed key is dropped
+    assert list(SpendSnapshot.objects.values_list('page_id', 'spend')) == [(7, 1000)]
@@ -0,0 +1,70 @@
+from unittest import mock
+
+import pytest
+from rest_framework.test import APIClient
+
+from polads.apps import start_background_refresh
+from polads.autocomplete import PrefixIndex, autocomplete_index
+from polads.client import get_client
+from polads.models import Page, Region, SpendRecord
+from polads.tests.test_client import fake_response
+
+URL = '/api/v1/search/pages_type_ahead/autocomplete/funding_entities'
+
+
+class TestPrefixIndex:
+    index = PrefixIndex([
+        ('Donald J. Trump for President', 'funding_entity', 1, 100),
+        ('Trump Make America Great Again Committee', 'funding_entity', 2, 500),
+        ('Tom Steyer 2020', 'page', 3, 50),
+    ])
+
+    def test_word_prefixes_ranked_by_weight(self):
+        names = [result['name'] for result in self.index.search('trump')]
+
+        assert names == ['Trump Make America Great Again Committee', 'Donald J. Trump for President']
+
+    def test_case_and_punctuation_are_ignored(self):
+        assert self.index.search('DONALD J.')[0]['page_id'] == 1
+        assert self.index.search('t', limit=1)[0]['name'] == 'Trump Make America Great Again Committee'
+        assert self.index.search('  ') == []
+
+
+@pytest.mark.django_db
+class TestAutocompleteRoute:
+    def teardown_method(self):
+        autocomplete_index._index = None
+
+    def test_cold_index_is_proxied(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.return_value = fake_response(json={'data': []})
+            APIClient().get(URL, {'q': 'tr'})
+
+        assert client_get.call_count == 1
+
+    def test_loaded_index_answers_locally(self):
+        region = Region.objects.create(name='US')
+        page = Page.objects.create(page_id=4, page_name='Biden', funding_entity='Biden for President')
+        SpendRecord.objects.create(region=region, page=page, time_period='2020-07-05', spend=5)
+        autocomplete_index.load()
+
+        with mock.patch.object(get_client(), 'get') as client_get:
+            response = APIClient().get(URL, {'q': 'bid'})
+
+        assert client_get.call_count == 0
+        assert response.data == {'data': [
+            {'type': 'page', 'name': 'Biden', 'page_id': 4},
+            {'type': 'funding_entity', 'name': 'Biden for President', 'page_id': 4},
+        ]}
+
+
+def test_background_refresh_is_started_only_when_enabled(settings):
+    with mock.patch.object(autocomplete_index, 'start') as start:
+        settings.POLADS_BACKGROUND_REFRESH = False
+        start_background_refresh()
+        assert not start.called
+
+        settings.POLADS_BACKGROUND_REFRESH = True
+        with mock.patch('polads.reference.reference_data.start'):
+            start_background_refresh()
+        start.assert_called_once_with(settings.POLADS_AUTOCOMPLETE_REFRESH_INTERVAL)
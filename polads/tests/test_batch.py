@@ -0,0 +1,76 @@
+from unittest import mock
+
+import pytest
+
+import requests
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.models import NotificationSubscription, SyncState
+from polads.tests.test_client import fake_response
+from polads.tests.test_passthrough import streamed_response
+
+
+def upstream(path, params=None, **kwargs):
+    if path == '/targeting/of_page/7':
+        raise requests.exceptions.ReadTimeout()
+    if path.startswith('/getaddetails/'):
+        return streamed_response([f'{{"path": "{path}"}}'.encode()])
+    return fake_response(json={'path': path, 'params': dict(params.items())})
+
+
+# Items run on the fan-out threads, which have their own connections
+@pytest.mark.django_db(transaction=True)
+class TestBatchPoladsView:
+    def test_items_are_fetched_in_order(self):
+        with mock.patch.object(get_client(), 'get', side_effect=upstream):
+            response = APIClient().post('/api/v1/batch', {'requests': [
+                {'path': 'total_spend/by_page/of_region/ohio', 'params': {'start_date': '2020-01-01'}},
+                {'path': '/targeting/of_page/7'},
+                {'path': 'batch'},
+                {'path': 'no/such/route'},
+            ]}, format='json')
+
+        assert response.status_code == 200
+        assert [item['status'] for item in response.data['responses']] == [200, 504, 404, 404]
+        assert response.data['responses'][0]['body'] == {
+            'path': '/total_spend/by_page/of_region/ohio',
+            'params': {'start_date': '2020-01-01'},
+        }
+
+    def test_items_are_answered_like_single_requests(self, settings):
+        settings.POLADS_LOCAL_NOTIFICATIONS = True
+        SyncState.objects.create(name='notifications:alice')
+        NotificationSubscription.objects.create(email='alice', page_id=7, params='{"page_id": "7"}')
+        with mock.patch.object(get_client(), 'get', side_effect=upstream) as client_get:
+            response = APIClient().post('/api/v1/batch', {'requests': [
+                {'path': 'notifications/of_user/alice'},
+                {'path': 'getaddetails/7'},
+            ]}, format='json')
+
+        listed, details = response.data['responses']
+        # Answered from the local store, not upstream
+        assert listed['status'] == 200 and listed['body'][0]['page_id'] == '7'
+        assert [call[0][0] for call in client_get.call_args_list] == ['/getaddetails/7']
+        assert details['body']['path'] == '/getaddetails/7'
+
+    def test_write_routes_are_rejected(self, settings):
+        settings.POLADS_LOCAL_NOTIFICATIONS = True
+        response = APIClient().post('/api/v1/batch', {'requests': [
+            {'path': 'notifications/add', 'params': {'email': 'alice', 'page_id': 7}},
+            {'path': 'notifications/remove/1'},
+        ]}, format='json')
+
+        assert [item['status'] for item in response.data['responses']] == [400, 400]
+        assert not NotificationSubscription.objects.exists()
+
+    def test_batch_size_is_limited(self, settings):
+        settings.POLADS_BATCH_MAX_REQUESTS = 1
+        response = APIClient().post('/api/v1/batch', {'requests': [
+            {'path': 'topics'}, {'path': 'races'},
+        ]}, format='json')
+
+        assert response.status_code == 400
+
+    def test_get_is_not_proxied(self):
+        assert APIClient().get('/api/v1/batch').status_code == 405
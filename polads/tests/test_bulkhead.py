@@ -0,0 +1,77 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from django.http import QueryDict
+from rest_framework.test import APIClient
+
+from polads.api.v1.views import ProxyPoladsView
+from polads.bulkhead import Bulkhead, BulkheadFull, upstream_bulkhead
+from polads.client import get_client
+from polads.singleflight import upstream_calls
+from polads.tests.test_client import fake_response
+
+
+class TestBulkhead:
+    def test_slots_are_shared_by_weight(self):
+        bulkhead = Bulkhead(max_in_flight=1, max_queue=10, queue_timeout=5, weights={'a': 2, 'b': 0.8})
+        bulkhead.acquire('x')
+        order = []
+
+        def request(tenant):
+            bulkhead.acquire(tenant)
+            order.append(tenant)
+            bulkhead.release()
+
+        threads = [threading.Thread(target=request, args=(tenant,)) for tenant in 'aaabb']
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while sum(bulkhead.stats()['queued'].values()) < 5 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        bulkhead.release()
+        for thread in threads:
+            thread.join()
+
+        assert order == ['a', 'a', 'b', 'a', 'b']
+        assert bulkhead.stats()['in_flight'] == 0
+
+    def test_full_queue_fails_fast(self):
+        bulkhead = Bulkhead(max_in_flight=1, max_queue=0, queue_timeout=5, retry_after=3)
+        bulkhead.acquire('a')
+
+        with pytest.raises(BulkheadFull) as excinfo:
+            bulkhead.acquire('a')
+        assert excinfo.value.retry_after == 3
+
+    def test_queued_request_times_out(self):
+        bulkhead = Bulkhead(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+        bulkhead.acquire('a')
+
+        with pytest.raises(BulkheadFull):
+            bulkhead.acquire('b')
+        assert bulkhead.stats()['queued'] == {}
+
+
+def test_rejected_requests_get_503():
+    with mock.patch.object(upstream_bulkhead, 'acquire', side_effect=BulkheadFull('anonymous', 2)), \
+            mock.patch.object(get_client(), 'get', return_value=fake_response(json={})) as client_get:
+        response = APIClient().get('/api/v1/topics', {'uncached': 1})
+
+    assert response.status_code == 503
+    assert response['Retry-After'] == '2'
+    assert not client_get.called
+
+
+def test_request_joining_a_rejected_tenant_is_admitted_on_its_own():
+    view = ProxyPoladsView()
+    view.tenant = 'light'
+    with mock.patch.object(upstream_calls, 'do', side_effect=BulkheadFull('heavy', 1)), \
+            mock.patch.object(get_client(), 'get', return_value=fake_response(json={})) as client_get:
+        view._request('/topics', QueryDict(), 'topics')
+
+    assert client_get.called
+    with mock.patch.object(upstream_calls, 'do', side_effect=BulkheadFull('light', 1)):
+        with pytest.raises(BulkheadFull):
+            view._request('/topics', QueryDict(), 'topics')
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.http import QueryDict
+from rest_framework.test import APIClient
+
+from polads.cache import TTLCache, cache_key, ttl_for
+from polads.client import get_client
+from polads.tests.test_client import fake_response
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_expiry(self):
+        clock = FakeClock()
+        cache = TTLCache(max_entries=10, clock=clock)
+        cache.set('a', 1, ttl=5)
+
+        assert cache.get('a') == 1
+        clock.now = 5
+        assert cache.get('a') is None
+
+    def test_lru_eviction_by_entries(self):
+        cache = TTLCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.evictions == 1
+
+    def test_lru_eviction_by_bytes(self):
+        cache = TTLCache(max_entries=10, max_bytes=10)
+        cache.set('a', 1, size=6)
+        cache.set('b', 2, size=6)
+        cache.set('c', 3, size=11)
+
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert cache.get('c') is None
+        assert cache.stats()['bytes'] == 6
+
+
+def test_cache_key_is_canonical():
+    first = cache_key('/getads', QueryDict('b=2&a=1&a=0'))
+    second = cache_key('/getads', QueryDict('a=0&b=2&a=1'))
+
+    assert first == second == '/getads?a=0&a=1&b=2'
+    assert cache_key('/topics', QueryDict('')) == '/topics'
+
+
+def test_notifications_are_never_cached(settings):
+    settings.POLADS_CACHE_DEFAULT_TTL = 60
+
+    assert ttl_for('notifications/of_user/<slug:email>') is None
+    assert ttl_for('topics') == settings.POLADS_CACHE_TTLS['topics']
+
+
+def test_view_serves_repeated_requests_from_cache():
+    with mock.patch.object(get_client(), 'get') as client_get:
+        client_get.return_value = fake_response(json=['health'])
+        first = APIClient().get('/api/v1/topics')
+        second = APIClient().get('/api/v1/topics')
+
+    assert first.data == second.data == ['health']
+    assert client_get.call_count == 1
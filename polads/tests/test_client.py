@@ -0,0 +1,74 @@
+import json as jsonlib
+from unittest import mock
+
+import requests
+from rest_framework.test import APIClient
+
+from polads.client import PoladsClient, get_client
+
+
+def fake_response(status_code=200, json=None, text='', headers=None):
+    response = mock.Mock(status_code=status_code, text=text)
+    response.headers = headers or {}
+    response.json.return_value = json
+    response.content = jsonlib.dumps(json).encode() if json is not None else text.encode()
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            response=response
+        )
+    return response
+
+
+class TestPoladsClient:
+    def test_route_timeouts(self):
+        client = PoladsClient(
+            connect_timeout=1,
+            read_timeout=2,
+            route_timeouts={'getads': (1, 30)},
+        )
+
+        assert client.timeout_for('getads') == (1, 30)
+        assert client.timeout_for('topics') == (1, 2)
+
+    def test_session_is_reused(self):
+        client = PoladsClient(base_url='http://polads.test', token='secret')
+
+        with mock.patch.object(client.session, 'get') as session_get:
+            client.get('/topics', route='topics')
+            client.get('/races', route='races')
+
+        assert session_get.call_count == 2
+        assert client.session.headers['Authorization'] == 'secret'
+        assert session_get.call_args[1]['timeout'] == client.timeout_for('races')
+
+    def test_stats(self):
+        client = PoladsClient(base_url='http://polads.test', pool_maxsize=3)
+        client.adapter.poolmanager.connection_from_url('http://polads.test')
+
+        stats = client.stats()
+
+        assert stats['in_flight'] == 0
+        assert stats['pools'][0]['maxsize'] == 3
+        assert stats['pools'][0]['in_use'] == 0
+
+    def test_get_client_is_shared(self):
+        assert get_client() is get_client()
+
+
+class TestProxyPoladsView:
+    def test_proxies_json(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.return_value = fake_response(json={'data': [1, 2]})
+            response = APIClient().get('/api/v1/topics', {'limit': 5})
+
+        assert response.status_code == 200
+        assert response.data == {'data': [1, 2]}
+        assert client_get.call_args[0][0] == '/topics'
+        assert client_get.call_args[1]['route'] == 'topics'
+
+    def test_upstream_timeout(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.side_effect = requests.exceptions.ReadTimeout()
+            response = APIClient().get('/api/v1/races')
+
+        assert response.status_code == 504
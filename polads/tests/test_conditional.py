@@ -0,0 +1,54 @@
+from unittest import mock
+
+from rest_framework.test import APIClient
+
+from polads.cache import response_cache
+from polads.client import get_client
+from polads.tests.test_client import fake_response
+
+
+class TestConditionalRequests:
+    def test_content_hash_etag_and_304(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.return_value = fake_response(json={'spend': 10})
+            first = APIClient().get('/api/v1/total_spend/by_page/of_region/ohio')
+            second = APIClient().get(
+                '/api/v1/total_spend/by_page/of_region/ohio',
+                HTTP_IF_NONE_MATCH=first['ETag']
+            )
+
+        assert first.status_code == 200
+        assert first['ETag'].startswith('"')
+        assert second.status_code == 304
+        assert second['ETag'] == first['ETag']
+        assert client_get.call_count == 1
+
+    def test_upstream_etag_and_last_modified_are_used(self):
+        headers = {
+            'ETag': '"v1"',
+            'Last-Modified': 'Wed, 21 Oct 2020 07:28:00 GMT',
+        }
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.return_value = fake_response(json=[], headers=headers)
+            response = APIClient().get(
+                '/api/v1/notifications/of_user/someone',
+                HTTP_IF_MODIFIED_SINCE='Thu, 22 Oct 2020 07:28:00 GMT'
+            )
+
+        assert response.status_code == 304
+        assert response['ETag'] == '"v1"'
+        assert response['Last-Modified'] == headers['Last-Modified']
+
+    def test_expired_entry_is_revalidated_upstream(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.return_value = fake_response(json=['a'], headers={'ETag': '"v1"'})
+            APIClient().get('/api/v1/topics')
+            response_cache.touch('/topics', ttl=-1)
+
+            client_get.return_value = fake_response(status_code=304)
+            response = APIClient().get('/api/v1/topics')
+
+        assert response.status_code == 200
+        assert response.data == ['a']
+        assert client_get.call_args[1]['headers'] == {'If-None-Match': '"v1"'}
+        assert response_cache.get('/topics') is not None
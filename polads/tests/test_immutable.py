@@ -0,0 +1,90 @@
+from unittest import mock
+
+import requests
+from rest_framework.test import APIClient
+
+from polads.cache import immutable_cache
+from polads.client import get_client
+from polads.tests.test_client import fake_response
+from polads.tests.test_passthrough import streamed_response
+
+
+def cluster(path, **kwargs):
+    archive_id = int(path.split('/')[2])
+    if archive_id == 404:
+        response = fake_response(status_code=404, text='Unknown archive id')
+    elif archive_id == 504:
+        raise requests.exceptions.ReadTimeout()
+    else:
+        response = fake_response(json={'ad_cluster_id': archive_id * 10})
+    # Single GETs read the body as a stream
+    response.iter_content.return_value = iter([response.content])
+    return response
+
+
+class TestImmutableRoutes:
+    def test_ad_details_are_cached_undecoded(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.return_value = streamed_response([b'{"ad": ', b'1}'])
+            first = APIClient().get('/api/v1/getaddetails/1')
+            second = APIClient().get('/api/v1/getaddetails/1')
+
+        assert client_get.call_count == 1
+        assert client_get.call_args[1]['stream'] is True
+        assert first.content == second.content == b'{"ad": 1}'
+        assert second['ETag'] == first['ETag']
+        client_get.return_value.json.assert_not_called()
+
+    def test_bodies_too_large_to_cache_are_streamed(self, settings):
+        settings.POLADS_IMMUTABLE_CACHE_MAX_ENTRY_BYTES = 10
+        announced = streamed_response([b'{"a": "long enough"}'], headers={
+            'Content-Type': 'application/json', 'Content-Length': '20',
+        })
+        unannounced = streamed_response([b'{"a": ', b'"long ', b'enough"}'])
+        with mock.patch.object(get_client(), 'get', side_effect=[announced, unannounced]):
+            first = APIClient().get('/api/v1/getaddetails/2')
+            second = APIClient().get('/api/v1/getaddetails/3')
+
+        assert b''.join(first.streaming_content) == b''.join(second.streaming_content) == b'{"a": "long enough"}'
+        assert first['Content-Length'] == '20'
+        assert len(immutable_cache) == 0
+        unannounced.close.assert_called_once_with()
+
+    def test_body_cut_short_is_a_bad_gateway(self):
+        def broken_body():
+            yield b'{"ad": '
+            raise requests.exceptions.ChunkedEncodingError('Connection broken')
+
+        upstream = streamed_response([])
+        upstream.iter_content.return_value = broken_body()
+        with mock.patch.object(get_client(), 'get', return_value=upstream):
+            response = APIClient().get('/api/v1/getaddetails/4')
+
+        assert response.status_code == 502
+        upstream.close.assert_called_once_with()
+        assert len(immutable_cache) == 0
+
+
+class TestArchiveClustersView:
+    def test_cached_ids_and_misses_are_resolved(self):
+        with mock.patch.object(get_client(), 'get', side_effect=cluster) as client_get:
+            APIClient().get('/api/v1/archive-id/1/cluster')
+            response = APIClient().post(
+                '/api/v1/archive-id/clusters',
+                {'archive_ids': [1, 2, 2, 404, 504]},
+                format='json'
+            )
+
+        assert response.status_code == 200
+        assert response.data['clusters'] == {'1': {'ad_cluster_id': 10}, '2': {'ad_cluster_id': 20}}
+        assert response.data['errors'] == {
+            '404': {'status': 404, 'detail': 'Unknown archive id'},
+            '504': {'status': 504, 'detail': 'Polads API timed out.'},
+        }
+        # archive id 1 came from the cache, 2 was only fetched once
+        assert client_get.call_count == 4
+
+    def test_ids_are_validated(self):
+        response = APIClient().post('/api/v1/archive-id/clusters', {'archive_ids': []}, format='json')
+
+        assert response.status_code == 400
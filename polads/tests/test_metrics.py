@@ -0,0 +1,56 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.metrics import Metrics, metrics
+from polads.tests.test_client import fake_response
+
+
+def test_histograms_are_cumulative():
+    registry = Metrics()
+    registry.observe('polads_upstream_duration_seconds', 0.003, route='topics', status=200)
+    registry.observe('polads_upstream_duration_seconds', 0.2, route='topics', status=200)
+    registry.increment('polads_cache_requests_total', route='topics', result='hit')
+
+    text = registry.render()
+    assert 'polads_upstream_duration_seconds_bucket{route="topics",status="200",le="0.005"} 1' in text
+    assert 'polads_upstream_duration_seconds_bucket{route="topics",status="200",le="+Inf"} 2' in text
+    assert 'polads_upstream_duration_seconds_count{route="topics",status="200"} 2' in text
+    assert 'polads_cache_requests_total{result="hit",route="topics"} 1' in text
+
+
+def test_routes_with_successes_and_errors_render():
+    registry = Metrics()
+    registry.observe('polads_upstream_duration_seconds', 0.1, route='topics', status=200)
+    registry.observe('polads_upstream_duration_seconds', 0.1, route='topics', status='error')
+
+    text = registry.render()
+    assert 'polads_upstream_duration_seconds_count{route="topics",status="200"} 1' in text
+    assert 'polads_upstream_duration_seconds_count{route="topics",status="error"} 1' in text
+
+
+@pytest.mark.django_db
+def test_metrics_are_labelled_by_route_template():
+    metrics.clear()
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json={'spenders': []})):
+        APIClient().get('/api/v1/total_spend/by_page/of_region/ohio')
+        APIClient().get('/api/v1/total_spend/by_page/of_region/ohio')
+
+    admin = get_user_model().objects.create_user('admin', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(admin)
+    text = client.get('/api/v1/polads/metrics').content.decode()
+
+    route = 'api/v1/total_spend/by_page/of_region/<slug:region_name>'
+    assert f'http_request_duration_seconds_count{{method="GET",route="{route}",status="200"}} 2' in text
+    assert 'result="hit",route="total_spend/by_page/of_region/<slug:region_name>"} 1' in text
+    assert 'stage="decode"' in text and 'stage="encode"' in text
+    assert 'ohio' not in text
+
+
+@pytest.mark.django_db
+def test_metrics_require_admin():
+    assert APIClient().get('/api/v1/polads/metrics').status_code == 401
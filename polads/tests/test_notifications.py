@@ -0,0 +1,152 @@
+from unittest import mock
+
+import pytest
+import requests
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.models import NotificationOutbox, NotificationSubscription
+from polads.tests.test_client import fake_response
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def local_notifications(settings):
+    settings.POLADS_LOCAL_NOTIFICATIONS = True
+
+
+def test_list_imports_upstream_once():
+    upstream = fake_response(json=[{'id': 41, 'email': 'alice', 'page_id': 7, 'region': 'ohio'}])
+    with mock.patch.object(get_client(), 'get', return_value=upstream) as client_get:
+        first = APIClient().get('/api/v1/notifications/of_user/alice')
+        second = APIClient().get('/api/v1/notifications/of_user/alice')
+
+    assert client_get.call_count == 1
+    assert first.json() == second.json()
+    assert first.json()[0]['page_id'] == 7
+    assert NotificationSubscription.objects.get().upstream_id == 41
+
+
+def test_list_after_outbox_sent_skips_known_subscriptions():
+    APIClient().get('/api/v1/notifications/add', {'email': 'alice', 'page_id': '7'})
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json={'id': 99})):
+        call_command('process_notification_outbox')
+
+    upstream = fake_response(json=[
+        {'id': 99, 'email': 'alice', 'page_id': 7},
+        {'id': 100, 'email': 'alice', 'page_id': 8},
+    ])
+    with mock.patch.object(get_client(), 'get', return_value=upstream):
+        listed = APIClient().get('/api/v1/notifications/of_user/alice')
+
+    assert listed.status_code == 200
+    assert len(listed.json()) == 2
+    assert sorted(NotificationSubscription.objects.values_list('upstream_id', flat=True)) == [99, 100]
+
+
+def test_failed_import_is_tried_again():
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(status_code=502)):
+        APIClient().get('/api/v1/notifications/of_user/alice')
+
+    upstream = fake_response(json=[{'id': 41, 'email': 'alice', 'page_id': 7}])
+    with mock.patch.object(get_client(), 'get', return_value=upstream):
+        listed = APIClient().get('/api/v1/notifications/of_user/alice')
+    assert [subscription['page_id'] for subscription in listed.json()] == [7]
+
+
+def test_add_and_remove_are_queued():
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json=[])) as client_get:
+        APIClient().get('/api/v1/notifications/of_user/alice')
+        added = APIClient().get(
+            '/api/v1/notifications/add', {'email': 'alice', 'page_id': '7', 'region': 'ohio'}
+        )
+        listed = APIClient().get('/api/v1/notifications/of_user/alice')
+    assert client_get.call_count == 1
+    assert listed.json() == [added.json()]
+
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json={'id': 99})) as client_get:
+        call_command('process_notification_outbox')
+    assert client_get.call_args[1]['params'] == {'email': 'alice', 'page_id': '7', 'region': 'ohio'}
+    assert NotificationSubscription.objects.get().upstream_id == 99
+
+    removed = APIClient().get(f"/api/v1/notifications/remove/{added.json()['id']}")
+    assert removed.status_code == 204
+    assert not NotificationSubscription.objects.exists()
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json={})) as client_get:
+        call_command('process_notification_outbox')
+    assert client_get.call_args[0][0] == '/notifications/remove/99'
+
+
+def test_removing_an_unsent_add_cancels_it():
+    added = APIClient().get('/api/v1/notifications/add', {'email': 'alice'})
+    APIClient().get(f"/api/v1/notifications/remove/{added.json()['id']}")
+
+    assert not NotificationOutbox.objects.exists()
+
+
+def test_failed_sends_are_retried_later(settings):
+    settings.POLADS_OUTBOX_MAX_ATTEMPTS = 2
+    settings.POLADS_OUTBOX_RETRY_DELAY = 0
+    APIClient().get('/api/v1/notifications/add', {'email': 'alice'})
+
+    with mock.patch.object(get_client(), 'get', side_effect=requests.exceptions.ConnectionError):
+        call_command('process_notification_outbox')
+        entry = NotificationOutbox.objects.get()
+        assert (entry.attempts, entry.failed) == (1, False)
+        call_command('process_notification_outbox')
+    entry.refresh_from_db()
+    assert (entry.attempts, entry.failed) == (2, True)
+
+
+def test_each_entry_is_committed_after_its_send():
+    APIClient().get('/api/v1/notifications/add', {'email': 'alice'})
+    APIClient().get('/api/v1/notifications/add', {'email': 'bob'})
+
+    # A list body carries no id, and an unexpected error only fails its own entry
+    responses = [fake_response(json=[{'id': 1}]), RuntimeError('boom')]
+    with mock.patch.object(get_client(), 'get', side_effect=responses):
+        call_command('process_notification_outbox')
+
+    alice, bob = NotificationOutbox.objects.order_by('created_at')
+    assert alice.sent_at is not None and alice.subscription.upstream_id is None
+    assert (bob.sent_at, bob.attempts, bob.last_error) == (None, 1, 'boom')
+
+
+def test_removing_a_sent_add_without_id_looks_the_id_up():
+    added = APIClient().get('/api/v1/notifications/add', {'email': 'alice', 'page_id': '7'})
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json=[])):
+        call_command('process_notification_outbox')
+
+    APIClient().get(f"/api/v1/notifications/remove/{added.json()['id']}")
+    assert NotificationSubscription.objects.get().removed_at is not None
+
+    responses = [
+        fake_response(json=[{'id': 5, 'email': 'alice', 'page_id': 8}, {'id': 6, 'email': 'alice', 'page_id': 7}]),
+        fake_response(json={}),
+    ]
+    with mock.patch.object(get_client(), 'get', side_effect=responses) as client_get:
+        call_command('process_notification_outbox')
+    assert client_get.call_args[0][0] == '/notifications/remove/6'
+    assert not NotificationSubscription.objects.exists()
+
+
+def test_removing_an_add_in_flight_removes_it_once_sent(settings):
+    settings.POLADS_OUTBOX_RETRY_DELAY = 0
+    added = APIClient().get('/api/v1/notifications/add', {'email': 'alice'})
+
+    def add(path, params=None, route=None):
+        # Removed by the user while the worker is sending the add
+        APIClient().get(f"/api/v1/notifications/remove/{added.json()['id']}")
+        return fake_response(json={'id': 5})
+
+    with mock.patch.object(get_client(), 'get', side_effect=add):
+        call_command('process_notification_outbox')
+    assert NotificationOutbox.objects.get(action=NotificationOutbox.ADD).sent_at is not None
+    assert NotificationSubscription.objects.get().upstream_id == 5
+
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json={})) as client_get:
+        call_command('process_notification_outbox')
+    assert client_get.call_args[0][0] == '/notifications/remove/5'
+    assert not NotificationSubscription.objects.exists()
@@ -0,0 +1,42 @@
+from unittest import mock
+
+import requests
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.tests.test_client import fake_response
+
+SUMMARY_URL = '/api/v1/page_summary/of_page/7/of_region/ohio'
+
+
+class TestPageSummaryView:
+    def test_sections_are_merged_and_cached(self):
+        with mock.patch.object(get_client(), 'get') as client_get:
+            client_get.side_effect = lambda path, **kwargs: fake_response(json=path)
+            first = APIClient().get(SUMMARY_URL)
+            second = APIClient().get(SUMMARY_URL)
+
+        assert first.status_code == 200
+        assert first.data['partial'] is False
+        assert first.data['total_spend'] == '/total_spend/of_page/7/of_region/ohio'
+        assert first.data['targeting'] == '/targeting/of_page/7'
+        assert second.data == first.data
+        assert client_get.call_count == 6
+
+    def test_partial_results_are_not_cached(self):
+        def upstream(path, **kwargs):
+            if path.startswith('/targeting'):
+                raise requests.exceptions.ReadTimeout()
+            return fake_response(json=path)
+
+        with mock.patch.object(get_client(), 'get', side_effect=upstream) as client_get:
+            first = APIClient().get(SUMMARY_URL)
+            APIClient().get(SUMMARY_URL)
+
+        assert first.data['partial'] is True
+        assert first.data['errors'] == {
+            'targeting': {'status': 504, 'detail': 'Polads API timed out.'}
+        }
+        assert 'targeting' not in first.data
+        # Sections are cached per route, only the failed one is retried
+        assert client_get.call_count == 7
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+
+
+def streamed_response(chunks, status_code=200, headers=None):
+    response = mock.Mock(status_code=status_code)
+    response.headers = headers or {'Content-Type': 'application/json'}
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+class TestPassthrough:
+    def test_body_is_streamed_without_decoding(self):
+        upstream = streamed_response(
+            [b'{"data": ', b'[1, 2]}'],
+            headers={'Content-Type': 'application/json; charset=utf-8', 'Content-Length': '16'}
+        )
+        with mock.patch.object(get_client(), 'get', return_value=upstream) as client_get:
+            response = APIClient().get('/api/v1/getads', {'search': 'vote'})
+            body = b''.join(response.streaming_content)
+
+        assert response.status_code == 200
+        assert body == b'{"data": [1, 2]}'
+        assert response['Content-Type'] == 'application/json; charset=utf-8'
+        assert response['Content-Length'] == '16'
+        assert client_get.call_args[1]['stream'] is True
+        upstream.json.assert_not_called()
+        upstream.close.assert_called_once_with()
+
+    def test_upstream_status_is_kept(self):
+        upstream = streamed_response([b'not found'], status_code=404, headers={
+            'Content-Type': 'text/plain', 'Content-Encoding': 'gzip', 'Content-Length': '3'
+        })
+        with mock.patch.object(get_client(), 'get', return_value=upstream):
+            response = APIClient().get('/api/v1/getads')
+
+        assert response.status_code == 404
+        assert response['Content-Type'] == 'text/plain'
+        assert not response.has_header('Content-Length')
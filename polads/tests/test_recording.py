@@ -0,0 +1,53 @@
+import sqlite3
+from unittest import mock
+
+import pytest
+import requests
+
+from polads.client import PoladsClient
+from polads.recording import Recording
+from polads.tests.test_client import fake_response
+
+
+@pytest.fixture
+def recording_path(tmp_path):
+    return str(tmp_path / 'recording.sqlite3')
+
+
+def test_recorded_responses_are_replayed(recording_path, settings):
+    settings.POLADS_RECORDING = recording_path
+    upstream = fake_response(json={'spenders': [1, 2]}, headers={'ETag': '"abc"'})
+    recorder = PoladsClient(mode='record', base_url='http://polads.test')
+    with mock.patch.object(recorder.session, 'get', return_value=upstream):
+        recorder.get('/topics', params={'b': '2', 'a': '1'}, route='topics')
+
+    replayer = PoladsClient(mode='replay', latency_scale=0)
+    with mock.patch.object(replayer.session, 'get') as session_get:
+        response = replayer.get('/topics', params={'a': '1', 'b': '2'}, route='topics')
+        streamed = replayer.get('/topics', params={'a': '1', 'b': '2'}, stream=True)
+
+    assert not session_get.called
+    assert response.status_code == 200
+    assert response.json() == {'spenders': [1, 2]}
+    assert response.headers['etag'] == '"abc"'
+    assert b''.join(streamed.iter_content(4)) == upstream.content
+
+
+def test_unrecorded_requests_fail_like_an_unreachable_upstream(recording_path, settings):
+    settings.POLADS_RECORDING = recording_path
+    replayer = PoladsClient(mode='replay', latency_scale=0)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replayer.get('/races', route='races')
+
+
+def test_failed_recording_still_returns_the_response(recording_path):
+    recording = Recording(recording_path)
+    recording._local.connection = mock.MagicMock()
+    recording._local.connection.__enter__.return_value.execute.side_effect = \
+        sqlite3.OperationalError('database is locked')
+    upstream = fake_response(json={'data': []})
+    recorder = PoladsClient(mode='record', base_url='http://polads.test', recording=recording)
+
+    with mock.patch.object(recorder.session, 'get', return_value=upstream):
+        assert recorder.get('/races', route='races') is upstream
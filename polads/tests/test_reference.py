@@ -0,0 +1,57 @@
+from unittest import mock
+
+import requests
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.reference import ReferenceData, race_ids, reference_data
+from polads.tests.test_client import fake_response
+
+UPSTREAM = {
+    '/topics': ['health', 'economy'],
+    '/races': [{'race_id': 11}, {'race_id': 12}],
+    '/race/11/candidates': [{'name': 'A'}],
+    '/race/12/candidates': [{'name': 'B'}],
+}
+
+
+def upstream(path, **kwargs):
+    return fake_response(json=UPSTREAM[path])
+
+
+def test_race_ids():
+    assert race_ids([{'race_id': 1}, {'id': 2}, 'bad']) == [1, 2]
+    assert race_ids({'races': [{'race_id': 3}]}) == [3]
+
+
+class TestReferenceData:
+    def test_refresh_loads_races_and_candidates(self):
+        data = ReferenceData()
+        with mock.patch.object(get_client(), 'get', side_effect=upstream):
+            assert data.refresh() == 4
+
+        assert data.get('/race/12/candidates').data == [{'name': 'B'}]
+
+    def test_failed_refresh_keeps_loaded_copy(self):
+        data = ReferenceData()
+        with mock.patch.object(get_client(), 'get', side_effect=upstream):
+            data.refresh()
+        with mock.patch.object(get_client(), 'get', side_effect=requests.exceptions.ConnectTimeout):
+            data.refresh()
+
+        assert data.get('/topics').data == ['health', 'economy']
+
+    def test_requests_are_served_from_memory(self):
+        with mock.patch.object(get_client(), 'get', side_effect=upstream):
+            reference_data.refresh()
+        try:
+            with mock.patch.object(get_client(), 'get') as client_get:
+                topics = APIClient().get('/api/v1/topics')
+                candidates = APIClient().get('/api/v1/race/11/candidates')
+        finally:
+            reference_data._responses = {}
+
+        assert client_get.call_count == 0
+        assert topics.data == ['health', 'economy']
+        assert candidates.data == [{'name': 'A'}]
+        assert topics.has_header('ETag')
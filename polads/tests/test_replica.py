@@ -0,0 +1,94 @@
+import datetime
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.models import Page, SpendRecord, SyncState
+from polads.tests.test_client import fake_response
+
+pytestmark = pytest.mark.django_db
+
+UPSTREAM = {
+    '/total_spend/by_page/of_region/ohio': {
+        'region_name': 'ohio',
+        'spenders': [{'page_id': 7, 'page_name': 'Seven', 'spend': 30}],
+    },
+    '/total_spend/by_topic/of_region/ohio': {
+        'region_name': 'ohio',
+        'spend_by_topic': [{'topic_name': 'health', 'spend': 5}],
+    },
+    '/spend_by_time_period/of_page/7/of_region/ohio': {'spend_in_timeperiod': [
+        {'time_period': '2020-07-05', 'spend': 10},
+        {'time_period': '2020-07-12', 'spend': 20},
+    ]},
+    '/spend_by_time_period/of_topic/health/of_region/ohio': {'spend_in_timeperiod': [
+        {'time_period': '2020-07-12', 'spend': 5},
+    ]},
+}
+
+
+def upstream(path, params=None, **kwargs):
+    return fake_response(json=UPSTREAM[path])
+
+
+def test_sync_is_incremental():
+    with mock.patch.object(get_client(), 'get', side_effect=upstream) as client_get:
+        call_command('sync_polads', 'ohio')
+        call_command('sync_polads', 'ohio', '--overlap-days=0')
+
+    assert Page.objects.get(page_id=7).page_name == 'Seven'
+    assert SpendRecord.objects.count() == 3
+    assert SyncState.objects.get(name='series:ohio:page:7').watermark == datetime.date(2020, 7, 12)
+    assert client_get.call_args_list[-1][1]['params'] == {'start_date': '2020-07-12'}
+
+
+def test_new_series_get_their_whole_history():
+    with mock.patch.object(get_client(), 'get', side_effect=upstream):
+        call_command('sync_polads', 'ohio')
+
+    UPSTREAM['/total_spend/by_page/of_region/ohio']['spenders'].append({'page_id': 8, 'spend': 1})
+    UPSTREAM['/spend_by_time_period/of_page/8/of_region/ohio'] = {'spend_in_timeperiod': [
+        {'time_period': '2019-01-06', 'spend': 1},
+    ]}
+    try:
+        with mock.patch.object(get_client(), 'get', side_effect=upstream) as client_get:
+            call_command('sync_polads', 'ohio')
+    finally:
+        UPSTREAM['/total_spend/by_page/of_region/ohio']['spenders'].pop()
+        del UPSTREAM['/spend_by_time_period/of_page/8/of_region/ohio']
+
+    params = {call[0][0]: call[1]['params'] for call in client_get.call_args_list}
+    assert params['/spend_by_time_period/of_page/8/of_region/ohio'] == {}
+    assert params['/spend_by_time_period/of_page/7/of_region/ohio'] == {'start_date': '2020-07-05'}
+    assert SpendRecord.objects.filter(page_id=8).count() == 1
+
+
+def test_spend_routes_are_served_locally(settings):
+    settings.POLADS_LOCAL_SPEND = True
+    with mock.patch.object(get_client(), 'get', side_effect=upstream):
+        call_command('sync_polads', 'ohio')
+
+    with mock.patch.object(get_client(), 'get') as client_get:
+        by_page = APIClient().get('/api/v1/total_spend/by_page/of_region/ohio')
+        series = APIClient().get(
+            '/api/v1/spend_by_time_period/of_page/7/of_region/ohio',
+            {'start_date': '2020-07-06'}
+        )
+        by_topic = APIClient().get('/api/v1/total_spend/by_topic/of_region/ohio')
+
+    assert client_get.call_count == 0
+    assert by_page.data == UPSTREAM['/total_spend/by_page/of_region/ohio']
+    assert series.data == {'spend_in_timeperiod': [{'time_period': '2020-07-12', 'spend': 20}]}
+    assert by_topic.data == UPSTREAM['/total_spend/by_topic/of_region/ohio']
+
+
+def test_unknown_region_is_proxied(settings):
+    settings.POLADS_LOCAL_SPEND = True
+    with mock.patch.object(get_client(), 'get', side_effect=upstream) as client_get:
+        response = APIClient().get('/api/v1/total_spend/by_page/of_region/ohio')
+
+    assert client_get.call_count == 1
+    assert response.data == UPSTREAM['/total_spend/by_page/of_region/ohio']
@@ -0,0 +1,47 @@
+import gzip
+import json
+import os
+
+import pytest
+from rest_framework.test import APIClient
+
+from onlineadobservatory_18943.schema import SchemaArtifacts, schema_artifacts, source_directories
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema_artifacts, 'directory', str(tmp_path))
+    monkeypatch.setattr(schema_artifacts, '_artifacts', {})
+    monkeypatch.setattr(schema_artifacts, '_schema', None)
+    return schema_artifacts
+
+
+def test_schema_documents_polads_path_parameters(artifacts):
+    response = APIClient().get('/api-docs/', {'format': 'openapi'})
+    schema = json.loads(response.content)
+
+    parameters = {
+        parameter['name']: parameter
+        for parameter in schema['paths']['/api/v1/total_spend/of_page/{page_id}/of_region/{region_name}']['parameters']
+    }
+    assert parameters['page_id']['type'] == 'integer'
+    assert parameters['page_id']['description'] == 'Facebook page id.'
+    assert parameters['region_name']['pattern'] == '^[-a-zA-Z0-9_]+$'
+
+
+def test_schema_is_built_once_and_served_gzipped(artifacts, tmp_path, monkeypatch):
+    first = APIClient().get('/api-docs/', {'format': 'openapi'}, HTTP_ACCEPT_ENCODING='gzip')
+    monkeypatch.setattr(SchemaArtifacts, 'encode', lambda self, codec: pytest.fail('generated again'))
+    monkeypatch.setattr(schema_artifacts, '_artifacts', {})
+    second = APIClient().get('/api-docs/', {'format': 'openapi'})
+    not_modified = APIClient().get('/api-docs/', {'format': 'openapi'}, HTTP_IF_NONE_MATCH=second['ETag'])
+
+    assert first['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(first.content) == second.content
+    assert not_modified.status_code == 304
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == ['.gz', '.json']
+
+
+def test_code_version_covers_project_packages_only():
+    names = {os.path.basename(directory) for directory in source_directories()}
+    assert names == {'onlineadobservatory_18943', 'home', 'users', 'polads'}
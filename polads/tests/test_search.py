@@ -0,0 +1,116 @@
+import json
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.http import QueryDict
+from rest_framework.test import APIClient
+
+from polads.api.v1 import views
+from polads.client import get_client
+from polads.search import AdSearchIndex, InvalidSearch
+
+ADS = [
+    {'ad_cluster_id': 1, 'page_id': 10, 'page_name': 'Vote Blue', 'funding_entity': 'Blue PAC',
+     'ad_creative_body': 'Protect health care for every family', 'region': 'OH',
+     'start_date': '2020-07-01', 'end_date': '2020-07-10', 'topics': ['health']},
+    {'ad_cluster_id': 2, 'page_id': 20, 'page_name': 'Red Wave', 'funding_entity': 'Health Freedom Fund',
+     'ad_creative_body': 'Lower taxes now', 'region': 'PA',
+     'start_date': '2020-07-05', 'end_date': '2020-07-20', 'topics': ['economy']},
+    {'ad_cluster_id': 3, 'page_id': 10, 'page_name': 'Vote Blue', 'funding_entity': 'Blue PAC',
+     'ad_creative_body': 'Early voting starts today', 'region': 'OH',
+     'start_date': '2020-09-01', 'end_date': '2020-09-10', 'topics': []},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = AdSearchIndex(str(tmp_path / 'ads.sqlite3'))
+    index.create()
+    index.add(ADS)
+    index.finish_ingest()
+    return index
+
+
+def ids(body):
+    return [ad['ad_cluster_id'] for ad in json.loads(body)]
+
+
+class TestAdSearchIndex:
+    def test_full_text_search_ranks_with_bm25(self, index):
+        # The funding entity match is weighted over the creative body match
+        assert ids(index.search(QueryDict('search=health'))) == [2, 1]
+
+    def test_filters_and_paging(self, index):
+        assert ids(index.search(QueryDict('page_id=10'))) == [3, 1]
+        assert ids(index.search(QueryDict('page_id=10&limit=1&offset=1'))) == [1]
+        assert ids(index.search(QueryDict('topic=health'))) == [1]
+        assert ids(index.search(QueryDict('start_date=2020-07-15&end_date=2020-08-01'))) == [2]
+
+    def test_unsupported_queries_are_left_to_polads(self, index):
+        assert index.search(QueryDict('order_by=spend')) is None
+        assert index.search(QueryDict('start_date=yesterday')) is None
+
+    def test_paging_is_validated(self, index):
+        # SQLite reads LIMIT -1 as no limit at all
+        assert ids(index.search(QueryDict('limit=-1'))) == [3]
+        assert ids(index.search(QueryDict('search=health&limit=-1'))) == [2]
+        with pytest.raises(InvalidSearch):
+            index.search(QueryDict('limit=many'))
+        with pytest.raises(InvalidSearch):
+            index.search(QueryDict('offset=-1'))
+
+    def test_search_terms_are_not_fts_syntax(self, index):
+        assert ids(index.search(QueryDict('search=care" OR "taxes'))) == []
+
+    def test_reindexing_replaces_ads(self, index):
+        index.add([dict(ADS[0], ad_creative_body='New text', topics=['economy'])])
+
+        assert ids(index.search(QueryDict('search=family'))) == []
+        assert ids(index.search(QueryDict('search=new'))) == [1]
+        assert ids(index.search(QueryDict('topic=economy'))) == [2, 1]
+
+
+def test_getads_is_served_from_index(index):
+    with mock.patch.object(views, 'ad_search_index', index), \
+            mock.patch.object(get_client(), 'get') as client_get:
+        response = APIClient().get('/api/v1/getads', {'search': 'voting'})
+
+    assert client_get.call_count == 0
+    assert response['Content-Type'] == 'application/json'
+    assert ids(response.content) == [3]
+
+
+def test_invalid_paging_is_a_bad_request(index):
+    with mock.patch.object(views, 'ad_search_index', index):
+        response = APIClient().get('/api/v1/getads', {'offset': '-5'})
+
+    assert response.status_code == 400
+
+
+def test_index_command_reads_json_lines(tmp_path, settings):
+    settings.POLADS_AD_SEARCH_INDEX = str(tmp_path / 'ads.sqlite3')
+    source = tmp_path / 'ads.jsonl'
+    source.write_text('\n'.join(json.dumps(ad) for ad in ADS))
+
+    call_command('index_polads_ads', file=str(source))
+
+    assert ids(AdSearchIndex(settings.POLADS_AD_SEARCH_INDEX).search(QueryDict('search=vote'))) == [3, 1]
+
+
+def test_index_is_used_only_after_a_complete_ingest(tmp_path, settings):
+    settings.POLADS_AD_SEARCH_INDEX = str(tmp_path / 'ads.sqlite3')
+    index = AdSearchIndex(settings.POLADS_AD_SEARCH_INDEX)
+    assert not index.is_ready()
+
+    with mock.patch.object(get_client(), 'get') as client_get:
+        client_get.return_value.json.side_effect = [ADS, ValueError('Truncated')]
+        with pytest.raises(ValueError):
+            call_command('index_polads_ads')
+    assert len(ids(index.search(QueryDict()))) == 3
+    assert not index.is_ready()
+
+    source = tmp_path / 'ads.jsonl'
+    source.write_text('\n'.join(json.dumps(ad) for ad in ADS))
+    call_command('index_polads_ads', file=str(source))
+    assert index.is_ready()
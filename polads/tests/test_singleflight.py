@@ -0,0 +1,46 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from polads.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_are_collapsed(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return 'payload'
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flight.collapsed < 4 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ['payload'] * 5
+        assert flight.stats() == {'executions': 1, 'collapsed': 4, 'in_flight': 0}
+
+    def test_errors_are_shared_and_not_remembered(self):
+        flight = SingleFlight()
+
+        with pytest.raises(ValueError):
+            flight.do('k', mock.Mock(side_effect=ValueError))
+
+        assert flight.do('k', lambda: 'ok') == 'ok'
+
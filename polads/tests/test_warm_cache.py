@@ -0,0 +1,64 @@
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from rest_framework.test import APIClient
+
+from polads.cache import response_cache
+from polads.client import get_client
+from polads.stats import hot_keys
+from polads.tests.test_client import fake_response
+
+
+@pytest.fixture
+def shared_cache(settings):
+    settings.CACHES = dict(settings.CACHES, polads={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'polads-tests',
+    })
+    yield caches['polads']
+    caches['polads'].clear()
+
+
+def test_requires_shared_cache():
+    with pytest.raises(CommandError):
+        call_command('warm_polads_cache')
+
+
+def test_hot_keys_are_merged_and_ranked(shared_cache):
+    hot_keys.record('topics', '/topics')
+    hot_keys.record('races', '/races')
+    hot_keys.record('races', '/races')
+    hot_keys.flush()
+
+    assert hot_keys.top(1) == [('races', '/races', 2)]
+
+
+def test_warms_configured_and_hot_paths(shared_cache):
+    with mock.patch.object(get_client(), 'get') as client_get:
+        client_get.return_value = fake_response(json={'spend': 1})
+        APIClient().get('/api/v1/total_spend/by_topic/of_region/ohio', {'b': 2, 'a': 1})
+        hot_keys.flush()
+        response_cache.clear()
+
+        out = StringIO()
+        call_command('warm_polads_cache', '--top=5', stdout=out)
+
+    assert 'Warmed 3 of 3 paths' in out.getvalue()
+    response_cache.clear()
+    # Entries reach other workers through the shared tier
+    assert response_cache.get('/total_spend/by_topic/of_region/ohio?a=1&b=2').data == {'spend': 1}
+    assert response_cache.get('/topics') is not None
+
+
+def test_given_paths_are_warmed_with_configured_ones(shared_cache, settings):
+    settings.POLADS_WARM_PATHS = ['/topics']
+    with mock.patch.object(get_client(), 'get') as client_get:
+        client_get.return_value = fake_response(json={'data': []})
+        out = StringIO()
+        call_command('warm_polads_cache', '/races', '/topics', '--top=0', stdout=out)
+
+    assert 'Warmed 2 of 2 paths' in out.getvalue()
+    assert sorted(call[0][0] for call in client_get.call_args_list) == ['/races', '/topics']
@@ -0,0 +1,57 @@
+import copy
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from polads.cache import TTLCache, shared_cache
+from polads.metrics import metrics
+
+SHARED_KEY_PREFIX = 'auth:token:'
+
+# Authenticated (user, token) pairs of this worker, by token key
+local_tokens = TTLCache(max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
+
+
+def invalidate_tokens(keys):
+    """Forget tokens here and in the shared tier; other workers' local copies
+    expire after AUTH_TOKEN_LOCAL_TTL seconds."""
+    keys = list(keys)
+    for key in keys:
+        local_tokens.delete(key)
+    shared = shared_cache()
+    if shared is not None and keys:
+        shared.delete_many([SHARED_KEY_PREFIX + key for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that remembers valid tokens.
+
+    Lookups go to a bounded in-process cache first, then to the shared cache
+    tier when configured (see POLADS_CACHE_URL), and only then to the
+    database. Tokens of inactive users are never cached.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = local_tokens.get(key)
+        if cached is not None:
+            metrics.increment('auth_token_cache_requests_total', result='local_hit')
+            # Views may set attributes on request.user, keep the cached one clean
+            return copy.copy(cached[0]), cached[1]
+
+        shared = shared_cache()
+        if shared is not None:
+            cached = shared.get(SHARED_KEY_PREFIX + key)
+            if cached is not None:
+                metrics.increment('auth_token_cache_requests_total', result='shared_hit')
+                local_tokens.set(key, cached, ttl=settings.AUTH_TOKEN_LOCAL_TTL)
+                return copy.copy(cached[0]), cached[1]
+
+        metrics.increment('auth_token_cache_requests_total', result='miss')
+        user, token = super().authenticate_credentials(key)
+        # Cache the token without its user, which is cached next to it
+        token = Token(key=token.key, user_id=token.user_id, created=token.created)
+        local_tokens.set(key, (user, token), ttl=settings.AUTH_TOKEN_LOCAL_TTL)
+        if shared is not None:
+            shared.set(SHARED_KEY_PREFIX + key, (user, token), timeout=settings.AUTH_TOKEN_SHARED_TTL)
+        return copy.copy(user), token
@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.onboarding import import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create user accounts from a CSV file with email, first_name, last_name, password, role ' \
+           'and organisation columns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, - for standard input.')
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int, default=1000,
+            help='Number of rows checked and inserted at once.',
+        )
+        parser.add_argument(
+            '--workers', dest='workers', type=int, default=None,
+            help='Processes hashing passwords, defaults to the number of CPUs.',
+        )
+        parser.add_argument(
+            '--no-confirmation', dest='send_confirmations', action='store_false',
+            help='Do not send the email confirmation users need before they can log in.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            if options['path'] == '-':
+                created, skipped = import_users(
+                    read_rows(sys.stdin), options['batch_size'], options['workers'],
+                    options['send_confirmations']
+                )
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as file:
+                    created, skipped = import_users(
+                        read_rows(file), options['batch_size'], options['workers'],
+                        options['send_confirmations']
+                    )
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        for line, reason in skipped:
+            self.stdout.write(self.style.WARNING(f"Line {line} skipped: {reason}."))
+        elapsed = time.monotonic() - started
+        rows = created + len(skipped)
+        self.stdout.write(
+            f"Imported {created} users, skipped {len(skipped)}, in {elapsed:.2f}s "
+            f"({rows / elapsed if elapsed else 0:.0f} rows/s)."
+        )
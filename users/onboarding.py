@@ -0,0 +1,192 @@
+"""Bulk import of user accounts, e.g. a whole newsroom at once.
+
+Rows are handled like ``SignupSerializer.create`` handles one signup, but a
+batch at a time: emails of the batch are checked with a few queries,
+passwords are hashed on a process pool, and users and their
+``EmailAddress`` rows are written with ``bulk_create``. Usernames come from
+allauth's ``generate_unique_username``, one lookup per row. Each imported
+user is sent the email confirmation that ACCOUNT_EMAIL_VERIFICATION
+requires before they can log in, through EMAIL_BACKEND.
+"""
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from allauth.account.adapter import get_adapter
+from allauth.account.models import EmailAddress
+from allauth.utils import generate_unique_username, valid_email_or_none
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models.functions import Lower
+
+User = get_user_model()
+
+COLUMNS = ('email', 'first_name', 'last_name', 'password', 'role', 'organisation')
+# Columns stored as-is in User fields of limited length
+LIMITED_COLUMNS = ('first_name', 'last_name', 'role', 'organisation')
+
+# Keeps IN lists under the SQLite limit of 999 query parameters
+LOOKUP_CHUNK_SIZE = 900
+
+
+def read_rows(file):
+    """``(line, row)`` of each CSV record, keyed by the COLUMNS present in the header."""
+    reader = csv.DictReader(file)
+    missing = {'email'} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+    for row in reader:
+        yield reader.line_num, {
+            column: (row.get(column) or '').strip() for column in COLUMNS
+        }
+
+
+def _existing(model, field, values):
+    """Lowercased values of ``field`` already taken in ``model``, case-insensitively."""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        found.update(
+            model.objects.annotate(lowered=Lower(field))
+            .filter(lowered__in=values[start:start + LOOKUP_CHUNK_SIZE])
+            .values_list('lowered', flat=True)
+        )
+    return found
+
+
+def hash_passwords(passwords, pool=None):
+    """Hashes of ``passwords``; blank ones get an unusable password."""
+    passwords = [password or None for password in passwords]
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 32)))
+
+
+class Importer:
+    """Creates users batch by batch; ``seen_emails`` spans batches to catch duplicates in the file."""
+
+    def __init__(self, pool=None, send_confirmations=True):
+        self.pool = pool
+        self.send_confirmations = send_confirmations
+        self.adapter = get_adapter()
+        self.seen_emails = set()
+        self.created = 0
+        self.skipped = []
+
+    def _validate(self, batch):
+        valid = []
+        for line, row in batch:
+            email = valid_email_or_none(self.adapter.clean_email(row['email']))
+            too_long = [
+                column for column in LIMITED_COLUMNS
+                if len(row[column]) > User._meta.get_field(column).max_length
+            ]
+            if len(f"{row['first_name']} {row['last_name']}") > User._meta.get_field('name').max_length:
+                too_long.append('name')
+            if email is None:
+                self.skipped.append((line, 'invalid email'))
+            elif too_long:
+                self.skipped.append((line, f"{', '.join(too_long)} too long"))
+            elif email.lower() in self.seen_emails:
+                self.skipped.append((line, 'duplicate email'))
+            else:
+                self.seen_emails.add(email.lower())
+                valid.append((line, dict(row, email=email)))
+
+        registered = _existing(User, 'email', [row['email'].lower() for _, row in valid])
+        registered |= _existing(EmailAddress, 'email', [row['email'].lower() for _, row in valid])
+        accepted = []
+        for line, row in valid:
+            if row['email'].lower() in registered:
+                self.skipped.append((line, 'email already registered'))
+            else:
+                accepted.append(row)
+        return accepted
+
+    def _usernames(self, rows):
+        """Split rows into ``(rows, usernames)`` to create now and rows deferred.
+
+        ``generate_unique_username`` only sees users already stored, so of
+        rows given the same username only the first is kept; the others are
+        deferred until it is stored.
+        """
+        accepted, usernames, deferred = [], [], []
+        taken = set()
+        for row in rows:
+            username = generate_unique_username([
+                f"{row['first_name']} {row['last_name']}", row['email'], 'user'
+            ])
+            if username.lower() in taken:
+                deferred.append(row)
+            else:
+                taken.add(username.lower())
+                accepted.append(row)
+                usernames.append(username)
+        return accepted, usernames, deferred
+
+    def _create(self, rows, usernames):
+        hashes = hash_passwords([row['password'] for row in rows], self.pool)
+        users = [
+            User(
+                username=username,
+                email=row['email'],
+                name=f"{row['first_name']} {row['last_name']}",
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                role=row['role'] or None,
+                organisation=row['organisation'] or None,
+                password=password,
+            )
+            for row, username, password in zip(rows, usernames, hashes)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            if users[0].pk is None:
+                # Backends such as SQLite do not return the ids of bulk inserts
+                ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+                for user in users:
+                    user.pk = ids[user.username]
+            EmailAddress.objects.bulk_create([
+                EmailAddress(user=user, email=user.email, primary=True, verified=False)
+                for user in users
+            ])
+        if self.send_confirmations:
+            for email_address in EmailAddress.objects.filter(user__in=users).select_related('user'):
+                email_address.send_confirmation(None, signup=True)
+        return len(users)
+
+    def import_batch(self, batch):
+        rows = self._validate(batch)
+        created = 0
+        while rows:
+            rows, usernames, deferred = self._usernames(rows)
+            created += self._create(rows, usernames)
+            rows = deferred
+        self.created += created
+        return created
+
+
+def import_users(rows, batch_size=1000, workers=None, send_confirmations=True):
+    """Create users of ``(line, row)`` pairs, returns ``(created, skipped)``.
+
+    ``skipped`` lists ``(line, reason)`` of the rows left out. Passwords are
+    hashed on ``workers`` processes, or in this process when it is 1.
+    Without ``send_confirmations`` the users get no confirmation email and
+    cannot log in until their email is verified another way.
+    """
+    pool = None if workers == 1 else ProcessPoolExecutor(workers, initializer=django.setup)
+    importer = Importer(pool, send_confirmations)
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                importer.import_batch(batch)
+                batch = []
+        if batch:
+            importer.import_batch(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return importer.created, importer.skipped
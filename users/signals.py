@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import invalidate_tokens
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_tokens_of_changed_user(sender, instance, created, **kwargs):
+    # Any change may matter to permissions, e.g. is_active or is_staff
+    if not created:
+        invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
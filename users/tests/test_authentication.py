@@ -0,0 +1,48 @@
+from unittest import mock
+
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from polads.client import get_client
+from polads.tests.test_client import fake_response
+from users.authentication import local_tokens
+from users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def token():
+    local_tokens.clear()
+    yield Token.objects.create(user=UserFactory(organisation='acme'))
+    local_tokens.clear()
+
+
+def get_topics(key):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    with mock.patch.object(get_client(), 'get', return_value=fake_response(json=[])):
+        return client.get('/api/v1/topics', {'uncached': 1})
+
+
+def test_cached_token_needs_no_queries(token, django_assert_num_queries):
+    assert get_topics(token.key).status_code == 200
+
+    with django_assert_num_queries(0):
+        assert get_topics(token.key).status_code == 200
+
+
+def test_deleted_token_is_forgotten(token):
+    get_topics(token.key)
+    token.delete()
+
+    assert get_topics(token.key).status_code == 401
+
+
+def test_deactivated_user_is_forgotten(token):
+    get_topics(token.key)
+    token.user.is_active = False
+    token.user.save()
+
+    assert get_topics(token.key).status_code == 401
@@ -0,0 +1,76 @@
+import io
+
+import pytest
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+
+from users.onboarding import import_users, read_rows
+from users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+CSV = """email,first_name,last_name,password,role,organisation
+Ann@Example.com,Ann,Lee,s3cret-pass,editor,Gazette
+ann@example.com,Ann,Other,s3cret-pass,,
+taken@example.com,Tom,Ken,,,
+not-an-email,No,One,,,
+bob@example.com,Bob,Lee,,,Gazette
+long@example.com,Ann,Lee,,,A newsroom with a name much longer than fifty characters
+"""
+
+
+def test_import_checks_batches_and_bulk_creates(django_assert_max_num_queries):
+    UserFactory(username='ann_lee', email='TAKEN@example.com')
+
+    # Four email lookups and three inserts per batch, and a username lookup per row
+    with django_assert_max_num_queries(10):
+        created, skipped = import_users(
+            read_rows(io.StringIO(CSV)), batch_size=10, workers=1, send_confirmations=False
+        )
+
+    assert created == 2
+    assert skipped == [
+        (3, 'duplicate email'), (5, 'invalid email'), (7, 'organisation too long'),
+        (4, 'email already registered'),
+    ]
+    ann = get_user_model().objects.get(email__iexact='ann@example.com')
+    assert ann.check_password('s3cret-pass')
+    assert (ann.name, ann.role, ann.organisation) == ('Ann Lee', 'editor', 'Gazette')
+    bob = get_user_model().objects.get(email='bob@example.com')
+    assert not bob.has_usable_password()
+    # ann_lee is already taken, so Ann gets a suffixed username
+    assert ann.username not in ('ann_lee', bob.username)
+    assert bob.username == 'bob_lee'
+    assert set(EmailAddress.objects.values_list('user', 'email', 'primary', 'verified')) == {
+        (ann.pk, 'Ann@Example.com', True, False),
+        (bob.pk, 'bob@example.com', True, False),
+    }
+
+
+def test_command_hashes_on_a_process_pool(tmp_path, capsys):
+    path = tmp_path / 'users.csv'
+    path.write_text(CSV)
+
+    call_command('import_users', str(path), '--batch-size', '2', '--workers', '2')
+
+    output = capsys.readouterr().out
+    assert 'Imported 3 users, skipped 3' in output and 'rows/s' in output
+    assert get_user_model().objects.get(email__iexact='ann@example.com').check_password('s3cret-pass')
+
+
+def test_imported_users_get_a_confirmation_email(settings):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    rows = [(2, dict(row, email=email)) for email, row in (
+        ('ann@example.com', {'first_name': 'Ann', 'last_name': 'Lee'}),
+        ('ann.lee@example.com', {'first_name': 'Ann', 'last_name': 'Lee'}),
+    )]
+    for line, row in rows:
+        row.update(password='', role='', organisation='')
+
+    assert import_users(rows, workers=1) == (2, [])
+    assert sorted(message.to[0] for message in mail.outbox) == ['ann.lee@example.com', 'ann@example.com']
+    # Same name in one batch, created one after the other
+    assert set(get_user_model().objects.values_list('username', flat=True)) >= {'ann_lee'}
+    assert get_user_model().objects.count() == 2